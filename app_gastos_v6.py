@@ -1,12 +1,26 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
-import pdfplumber
 import pandas as pd
-import re
-from datetime import datetime
-import io
+import os
+import time
+
+from gastos.agregados import RunningAggregates
+from gastos.almacen import TransactionStore
+from gastos.cache import ParseCache, hash_cache_key
+from gastos.categorias import ENGINE as reglas
+from gastos.exportar import FORMATS, ExportCache, parquet_available
+from gastos.extraccion import (
+    PARSER_VERSION, ExtractionInfo, count_pages, default_workers, extract_pdf_text, iter_extract_many,
+    iter_transaction_batches, transactions_frame,
+)
+from gastos.medicion import Medicion, Perfil, configure_logging
+from gastos.pipeline import build_transactions, display_frame, format_months
+from gastos.recurrentes import detect_recurring
+from gastos.sesiones import ParseLimiter, SessionMemory
+from gastos.subidas import UploadSpool
 
 st.set_page_config(page_title="Clasificador de Gastos V6", layout="centered")
+inicio_rerun = time.perf_counter()
 
 st.title("📊 Clasificador de Gastos por Mes y Categoría --- V6")
 st.write("Sube **uno o más** estados de cuenta en PDF (BBVA, AMEX). Unimos todo, detectamos año, generamos Mes (YYYY-MM), y agrupamos por **Categoría** y **Mes**.")
@@ -20,232 +34,358 @@ uploaded_files = st.file_uploader(
 )
 
 
-def detect_year(text: str):
-    """Busca un año de 4 dígitos razonable (2000-2099) en el PDF."""
-    years = re.findall(r"(20\d{2})", text)
-    if years:
-        return max(set(years), key=years.count)
-    return str(datetime.now().year)
-
-def parse_amount(raw: str):
-    """Convierte importes con formatos MX: separador miles , y decimal . o viceversa."""
-    s = raw.strip()
-    neg = False
-    if s.startswith("(") and s.endswith(")"):
-        neg = True
-        s = s[1:-1]
-    s = s.replace("$", "").replace(" ", "")
-    if re.search(r"\d+\.\d{3},\d{2}$", s):
-        s = s.replace(".", "").replace(",", ".")
-    else:
-        s = s.replace(",", "")
-    try:
-        val = float(s)
-        return -val if neg else val
-    except:
-        return None
-
-def extract_transactions_from_pdf(file):
+@st.cache_resource
+def get_parse_cache():
+    """Caché compartido por todas las sesiones del proceso; GASTOS_CACHE_DIR lo persiste en disco entre reinicios."""
+    return ParseCache(disk_dir=os.environ.get("GASTOS_CACHE_DIR") or None)
+
+@st.cache_resource
+def get_parse_limiter():
+    """Turnos para leer PDFs, compartidos por todas las sesiones (GASTOS_PARSEOS, por defecto un turno por CPU)."""
+    return ParseLimiter(int(os.environ.get("GASTOS_PARSEOS") or default_workers()))
+
+def session_budget_bytes():
+    """Presupuesto de memoria de cada sesión: GASTOS_MEMORIA_SESION_MB (64 MB por defecto)."""
+    return int(os.environ.get("GASTOS_MEMORIA_SESION_MB") or 64) * 1024 * 1024
+
+def get_session_memory():
+    """Categorías y texto extraído de la sesión, acotados al presupuesto de la sesión."""
+    if "memoria" not in st.session_state:
+        st.session_state.memoria = SessionMemory(session_budget_bytes())
+    return st.session_state.memoria
+
+def get_upload_spool():
+    """PDFs subidos de la sesión, copiados a un directorio temporal (GASTOS_SUBIDAS_DIR o el del sistema)."""
+    if "subidas" not in st.session_state:
+        st.session_state.subidas = UploadSpool(os.environ.get("GASTOS_SUBIDAS_DIR") or None)
+    return st.session_state.subidas
+
+def get_store():
+    """Historial SQLite de la sesión (ruta en GASTOS_DB)."""
+    if "store" not in st.session_state:
+        st.session_state.store = TransactionStore(os.environ.get("GASTOS_DB", "gastos_historial.sqlite3"))
+    return st.session_state.store
+
+def get_export_cache():
+    """Últimos archivos de descarga generados, por formato y huella de los datos (hasta 1/4 del presupuesto de la sesión)."""
+    if "export_cache" not in st.session_state:
+        st.session_state.export_cache = ExportCache(max_bytes=session_budget_bytes() // 4)
+    return st.session_state.export_cache
+
+def get_aggregates():
+    """Resúmenes por categoría y Mes x Categoría que se actualizan por archivo."""
+    if "agregados" not in st.session_state:
+        st.session_state.agregados = RunningAggregates()
+    return st.session_state.agregados
+
+def categorize_file(file_id, df_file):
     """
-    Extrae transacciones de un PDF (diseñado para BBVA y AMEX).
-    Une descripciones de múltiples líneas (ej. RFC en AMEX) y maneja
-    diferentes formatos de fecha y monto.
+    Categorías de un archivo, recordadas en la sesión junto con la versión de
+    las reglas; si las reglas cambiaron sólo se reevalúan las filas afectadas.
+    Regresa (categorias, anteriores); anteriores es None si no hubo cambios o
+    si la entrada se desalojó por el presupuesto de memoria de la sesión.
     """
-    text_from_pdf = ""
-    try:
-        with pdfplumber.open(file) as pdf:
-            for page in pdf.pages:
-                text_from_pdf += (page.extract_text() or "") + "\n"
-    except Exception as e:
-        st.error(f"Error al leer el PDF {getattr(file, 'name', 'PDF')}: {e}")
-        return pd.DataFrame()
-
-    if st.sidebar.checkbox(f"🔍 Ver texto extraído de {getattr(file, 'name', 'PDF')}", value=False):
-        st.text_area("Texto crudo extraído", text_from_pdf[:25000], height=300)
-
-    # --- 1. Pre-procesamiento: Unir líneas de descripción (para AMEX) ---
-    raw_lines = text_from_pdf.splitlines()
-    processed_lines = []
-    for i, line in enumerate(raw_lines):
-        line_lower = line.lower().strip()
-        if (line_lower.startswith("rfc") or line_lower.startswith("ref")) and processed_lines:
-            processed_lines[-1] += " | " + line.strip()
-        else:
-            processed_lines.append(line)
-
-    # --- 2. Inferencia de Año y Mapeo de Meses ---
-    year_hint = detect_year(text_from_pdf)
-    meses_map = {
-        "ene": 1, "enero": 1, "feb": 2, "febrero": 2, "mar": 3, "marzo": 3,
-        "abr": 4, "abril": 4, "may": 5, "mayo": 5, "jun": 6, "junio": 6,
-        "jul": 7, "julio": 7, "ago": 8, "agosto": 8, "sep": 9, "sept": 9,
-        "set": 9, "oct": 10, "octubre": 10, "nov": 11, "noviembre": 11,
-        "dic": 12, "diciembre": 12,
-    }
-
-    # --- 3. Patrones de Expresiones Regulares ---
-    date_pattern_str = r"\b(?P<d>\d{1,2})[/\s\.\-](?:de)?\s*(?P<m>(?:ene|feb|mar|abr|may|jun|jul|ago|sep|set|oct|nov|dic)[a-z]*|\d{1,2})[/\s\.\-]*(?P<y>\d{2,4})?\b"
-    date_pat = re.compile(date_pattern_str, re.IGNORECASE)
-    amount_pat = re.compile(r"([+-]?\s*\$?\s*\(?\s*\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?\s*\)?)\s*(CR)?\s*$", re.IGNORECASE)
-
-    # --- 4. Extracción de Transacciones ---
-    transactions = []
-    for line in processed_lines:
-        line_clean = re.sub(r'\s{2,}', ' ', line).strip()
-        amount_match = amount_pat.search(line_clean)
-        if not amount_match:
-            continue
-        amount_str = amount_match.group(1)
-        is_credit = amount_match.group(2)
-        amount = parse_amount(amount_str)
-        if amount is None:
-            continue
-        if is_credit or any(w in line_clean.lower() for w in ["abono", "pago", "payment"]):
-             amount = -abs(amount)
-        date_match = date_pat.search(line_clean)
-        if not date_match:
-            continue
-        try:
-            day = int(date_match.group('d'))
-            month_str = date_match.group('m').lower()
-            month = int(month_str) if month_str.isdigit() else meses_map.get(month_str[:3])
-            if not month: continue
-            year_str = date_match.group('y')
-            if year_str and len(year_str) == 2:
-                year = int(year_str) + 2000
-            elif year_str:
-                year = int(year_str)
-            else:
-                year = int(year_hint)
-            fecha = datetime(year, month, day)
-        except (ValueError, TypeError):
-            continue
-        desc_part = line_clean[:amount_match.start()]
-        desc_part = date_pat.sub("", desc_part, count=1).strip(" -–—|")
-        transactions.append([fecha.strftime("%d/%m/%Y"), desc_part, amount])
-    return pd.DataFrame(transactions, columns=["Fecha", "Descripción", "Monto"])
-
-def guess_category(descripcion: str):
-    desc = descripcion.lower()
-    if "amazon" in desc:
-        return "Amazon"
-    elif "uber eats" in desc:
-        return "Uber Eats"
-    elif "nespresso" in desc:
-        return "Nespresso"
-    elif any(keyword in desc for keyword in ["spotify", "netflix", "hbo", "prime video", "mubi", "f1", "youtubepremium"]):
-        return "Streaming"
-    elif any(keyword in desc for keyword in ["chatgpt", "chat-gpt", "membership", "one https://help.ub", "google*google", "google*gsuite purpleste cc", "tactiq.io", "gmail", "msft subscription", "microsoft", "icloud", "apple.com", "cloud", "uber one"]):
-        return "Suscripciones Tools"
-    elif any(keyword in desc for keyword in ["bp orquidea", "pemex", "gasolina", "g500", "shell", "bp", "hidrosina", "oxxo gas", "super serv echecaray"]):
-        return "Gasolina"
-    elif any(keyword in desc for keyword in ["oxxo", "7 eleven", "7-eleven"]):
-        return "Conveniencia"
-    elif "metlife" in desc or "seguro" in desc:
-        return "Seguros"
-    elif "melate" in desc or "tulotero" in desc:
-        return "Melate"
-    elif any(keyword in desc for keyword in ["scappino", "sfera"]):
-        return "Moda"
-    elif any(keyword in desc for keyword in ["intereses efi *", "efectivo inmediato 36"]):
-        return "Deuda TDC"
-    elif any(keyword in desc for keyword in ["etsy", "mixup", "discos la roma", "rappi", "mercado libre mexico"]):
-        return "Shopping"
-    elif any(keyword in desc for keyword in ["toks", "barracruda", "rest macaroni satelite", "islaa", "maison kayser", "restaurante", "rest", "yoyocafe", "matisse", "launica"]):
-        return "Restaurantes"
-    elif any(keyword in desc for keyword in ["cinepolis", "cinemex", "dulceria"]):
-        return "Cines"
-    elif any(keyword in desc for keyword in ["wal-mart", "superama", "wal mart", "la comer", "soriana", "chedraui", "wm express", "walmart", "cornershop"]):
-        return "Supermercado"
-    elif any(keyword in desc for keyword in ["liverpool", "sears", "el palacio de hierro sa naucalpan", "liv satelite 0004"]):
-        return "Tiendas Departamentales"
-    elif any(keyword in desc for keyword in ["starbucks", "cielito querido", "abts 15111"]):
-        return "Cafeterias"
-    elif any(keyword in desc for keyword in ["wsj", "the new york times"]):
-        return "News"
-    elif any(keyword in desc for keyword in ["bmw", "mini", "cooper"]):
-        return "Auto"
-    elif any(keyword in desc for keyword in ["barraca", "valenciana", "el palacio hierro sate", "el palacio hierro", "palaciodehierro"]):
-        return "Palacio de Hierro"
-    elif any(keyword in desc for keyword in ["home depot", "the home depot", "sodimac"]):
-        return "Hogar y Ferretería"
-    elif any(keyword in desc for keyword in ["aeromexico", "trip", "vivaaerobus", "volaris", "interjet", "aerolinea", "hotel", "hyatt", "marriott", "airbnb", "expedia", "booking"]):
-        return "Viajes"
-    elif any(keyword in desc for keyword in ["arena cdmx", "ticketmaster", "ticket", "boletia", "boletos", "evento", "concierto", "teatro", "seatgeek"]):
-        return "Espectáculos"
-    elif any(keyword in desc for keyword in ["gandhi", "porrua", "libreria", "lumen", "office depot", "office max"]):
-        return "Libros y Papelería"
-    elif any(keyword in desc for keyword in ["farmacia", "farmacias", "f del ahorro", "farm guad", "san pablo", "benavides", "f ahorro"]):
-        return "Farmacias"
-    elif any(keyword in desc for keyword in ["pase", "capufe", "tag", "aeropuerto", "estacionamiento", "parquimetro", "centro banamex servicio mexico", "parco"]):
-        return "Estacionamiento y Peajes"
-    elif any(keyword in desc for keyword in ["c.f.e.", "cfe", "sacmex", "tesoreria", "gdf sria"]):
-        return "Gobierno"
-    elif any(keyword in desc for keyword in ["naturgy", "comision federal de ele", "telmex", "izzi", "totalplay", "AT&T", "ATT", "Telcel", "cargo recurrente att"]):
-        return "Servicios"
-    elif any(keyword in desc for keyword in ["pago", "pago recibido", "abono", "deposito", "transferencia", "reembolso", "devolucion"]):
-        return "Pagos y Abonos"
+    store = get_session_memory()
+    # Una sola versión de las reglas para calcular y para anotar: otra sesión puede recargarlas a la mitad.
+    ruleset = reglas.ruleset
+    entry = store.get(("categorias", file_id))
+    if entry is None:
+        categorias, anteriores = reglas.match_series(df_file["Descripción"], ruleset), None
     else:
-        return "Otros"
+        version, anteriores = entry
+        categorias, changed = reglas.recategorize(df_file["Descripción"], anteriores, version, ruleset)
+        if not changed:
+            anteriores = None
+    store.put(("categorias", file_id), (ruleset.version, categorias))
+    return categorias, anteriores
+
+def finish_instrumentation():
+    """Cierra la medición del rerun y la muestra en el panel de rendimiento."""
+    medicion.close()
+    with panel_rendimiento:
+        st.caption(f"Rerun #{rerun_id}: {time.perf_counter() - inicio_rerun:.2f} s en total, "
+                   f"{medicion.total():.2f} s en etapas medidas.")
+        st.dataframe(medicion.frame(), hide_index=True)
+        st.caption(f"Caché de categorías: {len(reglas._memo)} entradas, "
+                   f"{reglas.memo_hits} aciertos, {reglas.memo_misses} claves evaluadas (reglas {reglas.version}).")
+        memoria, descargas = get_session_memory(), get_export_cache()
+        parse_cache, limitador = get_parse_cache(), get_parse_limiter()
+        st.caption(f"Memoria de la sesión: {memoria.total_bytes / 2**20:.1f} de {memoria.max_bytes / 2**20:.0f} MB "
+                   f"({len(memoria)} entradas, {memoria.evicted} desalojadas); descargas guardadas: "
+                   f"{len(descargas)} archivos, {descargas.total_bytes / 2**20:.1f} de {descargas.max_bytes / 2**20:.0f} MB. "
+                   f"Caché de PDFs compartido: {len(parse_cache)} archivos, {parse_cache.total_bytes / 2**20:.1f} MB, "
+                   f"{parse_cache.hits} aciertos. Lectura de PDFs: {limitador.active} de {limitador.slots} turnos "
+                   f"ocupados, {limitador.waiting} sesiones esperando.")
+        lectores = st.session_state.get("lectores")
+        if lectores:
+            st.caption("Lector de PDF: " + "; ".join(f"{name}: {backend}" for name, backend in lectores.items()))
+        exportaciones = st.session_state.get("medicion_exportes")
+        if exportaciones:
+            st.caption("Últimas descargas generadas")
+            st.dataframe(pd.DataFrame(exportaciones), hide_index=True)
+        if perfil is not None:
+            perfil.stop()
+            st.download_button("📥 Descargar perfil (.prof)", data=perfil.dump(),
+                               file_name=f"gastos_rerun_{rerun_id}.prof", mime="application/octet-stream")
+
+# Instrumentación: tiempos por etapa en la barra lateral y en el log "gastos.medicion".
+configure_logging()
+rerun_id = st.session_state["rerun_id"] = st.session_state.get("rerun_id", 0) + 1
+panel_rendimiento = st.sidebar.expander("⏱️ Rendimiento", expanded=False)
+medir_memoria = panel_rendimiento.checkbox("Medir memoria (tracemalloc, más lento)", value=False)
+perfilar = panel_rendimiento.checkbox("Perfilar este rerun (cProfile)", value=False,
+                                      help="Guarda un archivo .prof que se abre con snakeviz o `python -m pstats`.")
+medicion = Medicion(memoria=medir_memoria, run_id=rerun_id)
+perfil = Perfil() if perfilar else None
+if perfil is not None:
+    perfil.start()
 
+if reglas.maybe_reload():
+    st.sidebar.info(f"🔄 Reglas de categorías recargadas (versión {reglas.version}).")
+if reglas.last_error:
+    st.sidebar.error(f"Reglas de categorías inválidas, se usan las anteriores: {reglas.last_error}")
+
+historial = st.sidebar.checkbox("💾 Guardar en historial local", value=False,
+                                help="Guarda las transacciones en una base SQLite en este equipo para no volver a subir los mismos PDFs.")
+store = get_store() if historial else None
+if store is not None:
+    with medicion.stage("historial_recategorizar") as etapa:
+        cambiadas = etapa.rows_out = store.recategorize(reglas)
+    if cambiadas:
+        st.sidebar.info(f"{cambiadas} transacciones del historial cambiaron de categoría.")
+
+frames = []
 if uploaded_files:
-    frames = []
-    for f in uploaded_files:
-        df_file = extract_transactions_from_pdf(f)
-        if not df_file.empty:
-            frames.append(df_file.assign(_archivo=f.name))
+    parse_cache = get_parse_cache()
+    workers = st.sidebar.number_input("⚙️ Procesos para leer PDFs", min_value=1, max_value=32, value=default_workers())
+    tablas = st.sidebar.radio("📐 Modo de lectura", ["Texto (líneas)", "Tabla (columnas)"],
+                              help="El modo tabla corta cada renglón por la posición de las columnas de fecha, "
+                                   "descripción y monto.") == "Tabla (columnas)"
+    # Cada PDF se copia a disco una vez; de ahí en adelante se lee por ruta, sin copias de sus bytes.
+    spool = get_upload_spool()
+    archivos = [spool.add(f) for f in uploaded_files]
+    spool.retain(archivos)
+    llaves = [hash_cache_key(a.sha256, PARSER_VERSION + ("+tablas" if tablas else "")) for a in archivos]
+    parsed = [parse_cache.get(key) for key in llaves]
+    faltantes = [i for i, df_file in enumerate(parsed) if df_file is None]
+    if faltantes:
+        # Los turnos se comparten entre sesiones: si otra sesión ya leyó el mismo PDF
+        # mientras se esperaba, se toma del caché compartido.
+        limitador = get_parse_limiter()
+        espera = st.empty()
+        with limitador.slot(int(workers), on_wait=lambda: espera.info(
+                f"⏳ {limitador.active} de {limitador.slots} turnos de lectura de PDF ocupados en el servidor; esperando...")) as procesos:
+            espera.empty()
+            parsed = [df_file if df_file is not None else parse_cache.get(key) for df_file, key in zip(parsed, llaves)]
+            faltantes = [i for i, df_file in enumerate(parsed) if df_file is None]
+            # Cada archivo tiene su barra y los resultados parciales se muestran conforme se leen.
+            barras = {i: st.progress(0.0, text=f"{uploaded_files[i].name}: en cola") for i in faltantes}
+            parcial = st.empty()
+            agregados_parciales = RunningAggregates()
+            parciales = []
+
+            def mostrar_parciales(leidos):
+                with parcial.container():
+                    st.caption(f"Resultados parciales: {leidos} de {len(faltantes)} archivos leídos")
+                    st.bar_chart(agregados_parciales.by_category().set_index("Categoría"))
+                    st.dataframe(display_frame(build_transactions(parciales)))
 
-    if not frames:
+            def agregar_parcial(name, df_parte):
+                df_parcial = df_parte.assign(Categoría=reglas.match_series(df_parte["Descripción"]))
+                agregados_parciales.add_file((name, len(parciales)), df_parcial)
+                parciales.append((name, df_parcial))
+
+            if procesos > 1 or tablas:
+                # Los PDFs se leen en otros procesos: las barras avanzan por rangos de páginas
+                # y los resultados parciales se actualizan cuando termina cada archivo.
+                leidos = 0
+                with medicion.stage("extraccion", archivo=f"{len(faltantes)} archivos") as etapa:
+                    etapa.rows_out = 0
+                    for avance in iter_extract_many([(archivos[i].name, archivos[i].path) for i in faltantes],
+                                                    workers=procesos, tables=tablas):
+                        i = faltantes[avance.index]
+                        name = uploaded_files[i].name
+                        result = avance.result
+                        if result is None:
+                            barras[i].progress(avance.done / avance.total, text=f"{name}: {avance.done} de {avance.total} partes")
+                            continue
+                        if result.error is not None:
+                            barras[i].progress(1.0, text=f"{name}: error")
+                            st.error(f"Error al leer el PDF {result.name}: {result.error}")
+                            continue
+                        barras[i].progress(1.0, text=f"{name}: {len(result.df)} transacciones")
+                        parse_cache.put(llaves[i], result.df)
+                        parsed[i] = result.df
+                        etapa.rows_out += len(result.df)
+                        leidos += 1
+                        if result.df.empty:
+                            continue
+                        agregar_parcial(name, result.df)
+                        mostrar_parciales(leidos)
+            else:
+                # Un solo proceso: las barras avanzan por página y los resultados parciales se
+                # actualizan con cada página de transacciones (a lo más dos veces por segundo).
+                for leidos, i in enumerate(faltantes):
+                    name = uploaded_files[i].name
+                    partes = []
+                    info = ExtractionInfo()
+                    with medicion.stage("extraccion", archivo=name) as etapa:
+                        try:
+                            paginas = count_pages(archivos[i].path)
+                            barras[i].progress(0.0, text=f"{name}: 0 de {paginas} páginas")
+                            mostrado = time.perf_counter()
+                            for batch in iter_transaction_batches(archivos[i].path, info=info):
+                                partes.append(batch)
+                                agregar_parcial(name, batch)
+                                barras[i].progress(min(info.pages / max(paginas, 1), 1.0),
+                                                   text=f"{name}: {info.pages} de {paginas} páginas")
+                                if time.perf_counter() - mostrado >= 0.5:
+                                    mostrar_parciales(leidos)
+                                    mostrado = time.perf_counter()
+                        except Exception as e:
+                            barras[i].progress(1.0, text=f"{name}: error")
+                            st.error(f"Error al leer el PDF {name}: {e}")
+                            continue
+                        df_file = transactions_frame([]) if not partes else pd.concat(partes, ignore_index=True)
+                        df_file.attrs["backend"] = info.label()
+                        df_file.attrs["emisor"] = info.issuer
+                        etapa.rows_out = len(df_file)
+                    barras[i].progress(1.0, text=f"{name}: {len(df_file)} transacciones")
+                    parse_cache.put(llaves[i], df_file)
+                    parsed[i] = df_file
+                    if parciales:
+                        mostrar_parciales(leidos + 1)
+            for barra in barras.values():
+                barra.empty()
+            parcial.empty()
+
+    st.session_state.lectores = {
+        f.name: f"{df_file.attrs.get('backend', '?')}, emisor {df_file.attrs.get('emisor') or 'genérico'}"
+        for f, df_file in zip(uploaded_files, parsed) if df_file is not None
+    }
+    agregados = get_aggregates()
+    memoria = get_session_memory()
+    file_ids = set()
+    recategorizadas = 0
+    for f, archivo, key, df_file in zip(uploaded_files, archivos, llaves, parsed):
+        if st.sidebar.checkbox(f"🔍 Ver texto extraído de {f.name}", value=False):
+            texto = memoria.get(("texto", key))
+            if texto is None:
+                try:
+                    texto = extract_pdf_text(archivo.path)[:25000]
+                except Exception as e:
+                    st.error(f"Error al leer el PDF {f.name}: {e}")
+                else:
+                    memoria.put(("texto", key), texto)
+            if texto is not None:
+                st.text_area("Texto crudo extraído", texto, height=300)
+        if df_file is not None and not df_file.empty:
+            file_id = (key, f.name)
+            file_ids.add(file_id)
+            with medicion.stage("categorizacion", archivo=f.name, rows_in=len(df_file)) as etapa:
+                recordado = ("categorias", file_id) in memoria
+                categorias, anteriores = categorize_file(file_id, df_file)
+                df_categorizado = df_file.assign(Categoría=categorias)
+                etapa.rows_out = len(df_categorizado)
+            frames.append((f.name, df_categorizado))
+            with medicion.stage("agregacion", archivo=f.name, rows_in=len(df_categorizado)) as etapa:
+                if file_id not in agregados or not recordado:
+                    # Sin las categorías anteriores (desalojadas) no se puede aplicar el delta: se reemplaza.
+                    agregados.add_file(file_id, df_categorizado)
+                elif anteriores is not None:
+                    recategorizadas += int((anteriores != categorias).sum())
+                    agregados.recategorize(file_id, df_file, anteriores, categorias)
+                etapa.rows_out = len(df_categorizado)
+            if store is not None:
+                with medicion.stage("historial", archivo=f.name, rows_in=len(df_categorizado)) as etapa:
+                    # No hace nada si el archivo ya estaba en el historial.
+                    etapa.rows_out = store.ingest(archivo.sha256, f.name, df_categorizado)
+
+    agregados.sync(file_ids)
+    vigentes = {("categorias", file_id) for file_id in file_ids} | {("texto", key) for key in llaves}
+    for stale in set(memoria.keys()) - vigentes:
+        memoria.pop(stale)
+    if recategorizadas:
+        st.sidebar.info(f"{recategorizadas} transacciones cambiaron de categoría con las reglas nuevas.")
+
+with medicion.stage("unificacion", rows_in=sum(len(df) for _, df in frames)) as etapa:
+    if store is not None:
+        n_archivos, n_filas = store.counts()
+        st.sidebar.caption(f"Historial: {n_filas} transacciones de {n_archivos} archivos.")
+        df_gastos = store.transactions() if n_filas else None
+    else:
+        df_gastos = build_transactions(frames)
+    etapa.rows_out = 0 if df_gastos is None else len(df_gastos)
+
+if df_gastos is None:
+    if uploaded_files:
         st.warning("No se encontraron transacciones en los PDFs subidos.")
-        st.stop()
-
-    df_gastos = pd.concat(frames, ignore_index=True)
-
-    df_gastos["Fecha"] = pd.to_datetime(df_gastos["Fecha"], dayfirst=True, errors="coerce")
-    df_gastos = df_gastos.dropna(subset=["Fecha"])
-    df_gastos["Mes"] = df_gastos["Fecha"].dt.strftime("%Y-%m")
-
-    if "Categoría" not in df_gastos.columns:
-        df_gastos["Categoría"] = df_gastos["Descripción"].apply(guess_category)
-
-    st.subheader("🧾 Transacciones unificadas")
-    st.dataframe(df_gastos[["Fecha", "Mes", "Descripción", "Categoría", "Monto", "_archivo"]])
-
-    # --- FILTRO PARA MOSTRAR SOLO GASTOS EN RESÚMENES ---
-    df_solo_gastos = df_gastos[df_gastos['Monto'] > 0].copy()
-    
-    # --- FILTRO ADICIONAL PARA OCULTAR CATEGORÍAS EN RESÚMENES ---
-    categorias_a_excluir = ['Pagos y Abonos']
-    df_resumen_final = df_solo_gastos[~df_solo_gastos['Categoría'].isin(categorias_a_excluir)]
-
-    # Resúmenes
-    st.subheader("📌 Resumen por Categoría")
-    resumen_cat = df_resumen_final.groupby("Categoría", as_index=False)["Monto"].sum().sort_values("Monto", ascending=False)
-    st.bar_chart(resumen_cat.set_index("Categoría"))
-
-    st.subheader("📊 Tabla por Mes y Categoría")
-    pivot = pd.pivot_table(
-        df_resumen_final,
-        values="Monto",
-        index="Mes",
-        columns="Categoría",
-        aggfunc="sum",
-        fill_value=0
-    )
-    st.dataframe(pivot.sort_index(key=lambda idx: pd.to_datetime(idx + "-01", errors="coerce")))
-
-    # Exportar a Excel
-    st.subheader("⬇️ Descargar Datos")
-    excel_bytes = io.BytesIO()
-    with pd.ExcelWriter(excel_bytes, engine="xlsxwriter") as writer:
-        df_gastos.to_excel(writer, sheet_name="Transacciones", index=False)
-        resumen_cat.to_excel(writer, sheet_name="Por Categoría", index=False)
-        pivot.to_excel(writer, sheet_name="Mes-Categoría")
-    st.download_button(
-        label="📥 Descargar Excel",
-        data=excel_bytes.getvalue(),
-        file_name="gastos_resumen.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    else:
+        st.info("💡 Sube uno o más PDFs para empezar.")
+    finish_instrumentation()
+    st.stop()
+
+# Cargos recurrentes: series mensuales o anuales del mismo comercio y monto estable.
+with medicion.stage("recurrentes", rows_in=len(df_gastos)) as etapa:
+    recurrente, proximos = detect_recurring(df_gastos)
+    df_gastos = df_gastos.assign(Recurrente=recurrente)
+    etapa.rows_out = len(proximos)
+
+st.subheader("🧾 Transacciones unificadas")
+st.dataframe(display_frame(df_gastos[["Fecha", "Mes", "Descripción", "Categoría", "Centavos", "Recurrente", "_archivo"]]))
+
+aproximadas = reglas.match_details(df_gastos["Descripción"]).dropna(subset=["Comercio"])
+if not aproximadas.empty:
+    with st.expander(f"🔎 {len(aproximadas)} descripciones categorizadas por parecido con un comercio conocido"):
+        st.dataframe(aproximadas.sort_values("Confianza"), hide_index=True)
+
+# Resúmenes: sólo gastos (monto > 0) y sin 'Pagos y Abonos'
+with medicion.stage("resumenes", rows_in=len(df_gastos)) as etapa:
+    if store is not None:
+        resumen_cat = store.summary_by_category()
+        pivot = store.summary_by_month_category()
+    else:
+        resumen_cat = get_aggregates().by_category()
+        pivot = get_aggregates().pivot()
+    etapa.rows_out = len(resumen_cat)
+
+st.subheader("📌 Resumen por Categoría")
+st.bar_chart(resumen_cat.set_index("Categoría"))
+
+st.subheader("📊 Tabla por Mes y Categoría")
+st.dataframe(format_months(pivot.sort_index()))
+
+st.subheader("🔁 Cargos recurrentes")
+if proximos.empty:
+    st.caption("No se encontraron cargos mensuales o anuales con monto estable.")
 else:
-    st.info("💡 Sube uno o más PDFs para empezar.")
\ No newline at end of file
+    st.caption(f"{len(proximos)} cargos recurrentes vigentes ({int(recurrente.sum())} transacciones marcadas como "
+               f"Recurrente en el historial); el próximo cargo se proyecta con su cadencia.")
+    st.dataframe(proximos, hide_index=True)
+
+# Exportar: el archivo se genera al hacer clic y se reutiliza mientras los datos no cambien.
+st.subheader("⬇️ Descargar Datos")
+formatos = {"Excel (resúmenes)": "xlsx", "CSV comprimido (.csv.gz)": "csv.gz"}
+if parquet_available():
+    formatos["Parquet"] = "parquet"
+fmt = formatos[st.radio("Formato", list(formatos), horizontal=True)]
+file_name, mime = FORMATS[fmt]
+export_cache = get_export_cache()
+exportaciones = st.session_state.setdefault("medicion_exportes", [])
+
+def generate_export():
+    # Corre en otro hilo al hacer clic: sólo usa objetos capturados, no st.session_state.
+    with Medicion(run_id=rerun_id).stage(f"exportacion_{fmt}", rows_in=len(df_gastos)) as etapa:
+        data = export_cache.get(fmt, df_gastos, resumen_cat, pivot, proximos)
+        etapa.rows_out = len(df_gastos)
+    exportaciones[:] = (exportaciones + [etapa.as_dict()])[-5:]
+    return data
+
+st.download_button(
+    label="📥 Descargar",
+    data=generate_export,
+    file_name=file_name,
+    mime=mime
+)
+
+finish_instrumentation()
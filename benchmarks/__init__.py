@@ -0,0 +1 @@
+"""Benchmarks del pipeline de gastos (`python -m benchmarks.bench`)."""
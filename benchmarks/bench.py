@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark por etapas del pipeline sobre estados de cuenta sintéticos:
+
+    python -m benchmarks.bench --files 4 --pages 20 --lines 45 -o bench.json
+    python -m benchmarks.bench -o nuevo.json --compare bench.json
+
+Cada etapa (texto del PDF, unión RFC/REF, regex, categorización, agregación,
+exportación a Excel y, como alternativa, la extracción por columnas) se mide
+por separado, `--repeat` veces, y el resultado se guarda en JSON (mínimo y
+mediana en segundos, elementos procesados y elementos/s por etapa). Con
+`--compare` se imprime el cociente contra una corrida anterior.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.sintetico import statement_files, statement_pdf
+from gastos.agregados import RunningAggregates
+from gastos.categorias import ENGINE
+from gastos.exportar import excel_bytes
+from gastos.extraccion import (
+    PARSER_VERSION, _to_record, iter_lines, iter_page_texts, match_line, merge_continuations,
+    transactions_frame,
+)
+from gastos.lectores import resolve_backend
+from gastos.pipeline import build_transactions, summarize
+from gastos.tablas import extract_transactions_tables
+
+
+def _time(fn, repeat: int):
+    """(resultado de la última corrida, lista de tiempos en segundos)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def _regex_parse(merged):
+    # Mismo año de referencia para todas las líneas: el año sale de la cabecera sintética.
+    frames = []
+    for lines in merged:
+        records = []
+        for line in lines:
+            match = match_line(line)
+            if match is not None:
+                record = _to_record(match, 2024)
+                if record is not None:
+                    records.append(record)
+        frames.append(transactions_frame(records))
+    return frames
+
+
+def _aggregate(frames):
+    df_gastos = build_transactions(frames)
+    agregados = RunningAggregates()
+    for name, df in frames:
+        agregados.add_file(name, df)
+    _, resumen_cat, pivot = summarize(df_gastos)
+    return df_gastos, resumen_cat, pivot
+
+
+def run(files: int, pages: int, lines: int, repeat: int, seed: int = 0, vectorized: bool = False, backend: str = None):
+    """Corre todas las etapas y regresa el reporte como diccionario."""
+    backend = resolve_backend(backend)
+    statements = statement_files(files, pages, lines, seed=seed)
+    pdfs = [(name, statement_pdf(page_lines)) for name, page_lines in statements]
+    stages = {}
+
+    def record(stage, fn, count, unit="filas"):
+        result, times = _time(fn, repeat)
+        n = count(result)
+        best = min(times)
+        stages[stage] = {
+            "seconds_min": best,
+            "seconds_median": statistics.median(times),
+            "items": n,
+            "unit": unit,
+            "items_per_s": (n / best) if best else None,
+        }
+        return result
+
+    texts = record("pdf_text", lambda: [list(iter_page_texts(pdf, backend)) for _, pdf in pdfs],
+                   lambda r: sum(len(t) for t in r), "páginas")
+    merged = record("line_merge", lambda: [list(merge_continuations(iter_lines(t))) for t in texts],
+                    lambda r: sum(len(lines) for lines in r), "líneas")
+    record("table_extract", lambda: [extract_transactions_tables(pdf, backend=backend) for _, pdf in pdfs],
+           lambda r: sum(len(df) for df in r))
+    parsed = record("regex_parse", lambda: _regex_parse(merged), lambda r: sum(len(df) for df in r))
+    if vectorized:
+        from gastos.vectorizado import parse_pages_vectorized
+        record("regex_parse_vectorizado", lambda: [parse_pages_vectorized(t) for t in texts],
+               lambda r: sum(len(df) for df in r))
+    categorized = record(
+        "categorization",
+        lambda: [df.assign(Categoría=ENGINE.match_series(df["Descripción"])) for df in parsed],
+        lambda r: sum(len(df) for df in r))
+    frames = [(name, df) for (name, _), df in zip(pdfs, categorized)]
+    df_gastos, resumen_cat, pivot = record("aggregation", lambda: _aggregate(frames), lambda r: len(r[0]))
+    record("excel_export", lambda: excel_bytes(df_gastos, resumen_cat, pivot), lambda _: len(df_gastos))
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "config": {"files": files, "pages": pages, "lines": lines, "repeat": repeat, "seed": seed, "lector": backend},
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "parser_version": PARSER_VERSION,
+            "reglas_version": ENGINE.version,
+            "plataforma": platform.platform(),
+        },
+        "stages": stages,
+        "total_seconds_min": sum(s["seconds_min"] for s in stages.values()),
+    }
+
+
+def compare(report, previous):
+    """Líneas de texto con el cociente nuevo/anterior por etapa (>1 es más lento)."""
+    out = []
+    for stage, now in report["stages"].items():
+        before = previous.get("stages", {}).get(stage)
+        if before is None:
+            out.append(f"{stage:26s} {now['seconds_min']:9.4f}s  (nueva)")
+            continue
+        ratio = now["seconds_min"] / before["seconds_min"] if before["seconds_min"] else float("inf")
+        out.append(f"{stage:26s} {now['seconds_min']:9.4f}s  vs {before['seconds_min']:9.4f}s  x{ratio:.2f}")
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench", description="Benchmark por etapas del pipeline de gastos.")
+    parser.add_argument("--files", type=int, default=4, help="Estados de cuenta (alternando BBVA y AMEX)")
+    parser.add_argument("--pages", type=int, default=20, help="Páginas por estado")
+    parser.add_argument("--lines", type=int, default=45, help="Líneas por página")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por etapa")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vectorizado", action="store_true", help="Medir también el parser por lotes")
+    parser.add_argument("--lector", help="Lector de PDF (pdfplumber, pypdfium2; default: el más rápido disponible)")
+    parser.add_argument("-o", "--output", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    report = run(args.files, args.pages, args.lines, args.repeat, args.seed, args.vectorizado, args.lector)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(report, json.load(f))))
+    else:
+        for stage, s in report["stages"].items():
+            rate = f"{s['items_per_s']:,.0f} {s['unit']}/s" if s["items_per_s"] else ""
+            print(f"{stage:26s} {s['seconds_min']:9.4f}s  {rate}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del modo multiusuario: N sesiones simultáneas contra un
+servidor local de Streamlit.
+
+    python -m benchmarks.carga --sesiones 8 --files 2 --pages 20
+    python -m benchmarks.carga --url http://localhost:8501 --sesiones 4 --distintos
+
+Sin `--url` se levanta `streamlit run app_gastos_v6.py` en un puerto libre
+(sin protección XSRF, sólo para la prueba) y se detiene al terminar. Cada
+sesión habla el protocolo del navegador: abre el websocket, corre la app,
+sube sus PDFs sintéticos a /_stcore/upload_file y vuelve a correrla con el
+estado del file_uploader. Por defecto todas las sesiones suben los mismos
+PDFs (el caso del caché compartido); con `--distintos` cada una sube los
+suyos. Se reportan los tiempos por sesión, cuántas esperaron turno para
+leer PDFs y las excepciones de la app (código 1 si hubo alguna).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+from benchmarks.sintetico import statement_files, statement_pdf
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app_gastos_v6.py")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env=None):
+    """Levanta la app en `port` y espera a que responda /_stcore/health."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+         "--server.port", str(port), "--server.enableXsrfProtection", "false",
+         "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/_stcore/health", timeout=1).ok:
+                return proc, url
+        except requests.ConnectionError:
+            pass
+        if proc.poll() is not None:
+            break
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("El servidor de Streamlit no arrancó")
+
+
+async def _run_script(ws, states=None):
+    """Pide un rerun y lee los mensajes hasta que termina el script."""
+    msg = BackMsg()
+    msg.rerun_script.query_string = ""
+    if states is not None:
+        msg.rerun_script.widget_states.CopyFrom(states)
+    await ws.send(msg.SerializeToString())
+    run = {"session_id": None, "uploader": None, "exceptions": [], "waited": False}
+    while True:
+        fwd = ForwardMsg()
+        fwd.ParseFromString(await ws.recv())
+        kind = fwd.WhichOneof("type")
+        if kind == "new_session":
+            run["session_id"] = fwd.new_session.initialize.session_id
+        elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+            element = fwd.delta.new_element
+            etype = element.WhichOneof("type")
+            if etype == "file_uploader":
+                run["uploader"] = element.file_uploader.id
+            elif etype == "exception":
+                run["exceptions"].append(element.exception.message)
+            elif etype == "alert" and "esperando" in element.alert.body:
+                run["waited"] = True
+        elif kind == "script_finished":
+            return run
+
+
+async def session(url: str, pdfs):
+    """Una sesión de navegador: abre la app, sube `pdfs` [(nombre, bytes)] y espera los resultados."""
+    ws_url = url.replace("http", "ws", 1) + "/_stcore/stream"
+    start = time.perf_counter()
+    async with websockets.connect(ws_url, subprotocols=["streamlit"], max_size=None) as ws:
+        first = await _run_script(ws)
+        opened = time.perf_counter()
+        states = WidgetStates()
+        widget = states.widgets.add()
+        widget.id = first["uploader"]
+        for name, data in pdfs:
+            file_id = str(uuid.uuid4())
+            response = await asyncio.to_thread(
+                requests.put, f"{url}/_stcore/upload_file/{first['session_id']}/{file_id}",
+                files={"file": (name, data, "application/pdf")},
+            )
+            response.raise_for_status()
+            info = widget.file_uploader_state_value.uploaded_file_info.add()
+            info.file_id = file_id
+            info.name = name
+            info.size = len(data)
+        uploaded = time.perf_counter()
+        result = await _run_script(ws, states)
+        done = time.perf_counter()
+    return {
+        "abrir_s": opened - start,
+        "subir_s": uploaded - opened,
+        "procesar_s": done - uploaded,
+        "total_s": done - start,
+        "espero_turno": result["waited"],
+        "excepciones": first["exceptions"] + result["exceptions"],
+    }
+
+
+async def run_sessions(url: str, per_session):
+    return await asyncio.gather(*(session(url, pdfs) for pdfs in per_session))
+
+
+def _stats(values):
+    values = sorted(values)
+    return {
+        "p50": statistics.median(values),
+        "p95": values[min(len(values) - 1, round(0.95 * (len(values) - 1)))],
+        "max": values[-1],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.carga", description="Prueba de carga con sesiones simultáneas.")
+    parser.add_argument("--url", help="Servidor ya levantado (default: levantar uno local)")
+    parser.add_argument("--sesiones", type=int, default=8, help="Sesiones simultáneas")
+    parser.add_argument("--files", type=int, default=2, help="PDFs por sesión")
+    parser.add_argument("--pages", type=int, default=10, help="Páginas por PDF")
+    parser.add_argument("--lines", type=int, default=45, help="Líneas por página")
+    parser.add_argument("--distintos", action="store_true", help="Cada sesión sube PDFs distintos (sin aciertos de caché)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    def pdfs(seed):
+        return [(name, statement_pdf(pages)) for name, pages in statement_files(args.files, args.pages, args.lines, seed=seed)]
+
+    shared = pdfs(args.seed)
+    per_session = [pdfs(args.seed + 1000 * (i + 1)) if args.distintos else shared for i in range(args.sesiones)]
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(_free_port())
+    try:
+        start = time.perf_counter()
+        results = asyncio.run(run_sessions(url.rstrip("/"), per_session))
+        wall = time.perf_counter() - start
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    report = {
+        "config": vars(args),
+        "wall_s": wall,
+        "sesiones_por_s": len(results) / wall,
+        "procesar_s": _stats([r["procesar_s"] for r in results]),
+        "total_s": _stats([r["total_s"] for r in results]),
+        "esperaron_turno": sum(r["espero_turno"] for r in results),
+        "excepciones": [e for r in results for e in r["excepciones"]],
+        "sesiones": results,
+    }
+    print(f"{len(results)} sesiones en {wall:.2f} s ({report['sesiones_por_s']:.2f} sesiones/s), "
+          f"{report['esperaron_turno']} esperaron turno para leer PDFs")
+    for name in ("procesar_s", "total_s"):
+        s = report[name]
+        print(f"{name:10s} p50 {s['p50']:.2f} s  p95 {s['p95']:.2f} s  máx {s['max']:.2f} s")
+    for error in report["excepciones"]:
+        print(f"Excepción en la app: {error}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 1 if report["excepciones"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Coincidencias aproximadas de comercios (MerchantIndex):
+
+    python -m benchmarks.comercios
+    python -m benchmarks.comercios --distinct 30000
+
+Revisa una lista de descripciones con errores, cortes y palabras pegadas
+("STARBUKS", "LIVERPO", "HOMEDEPOT"), además de claves de una sola palabra
+contra palabras clave de varias ("INTERESES" contra "intereses efi *"), y
+termina con código 1 si alguna da otra categoría o lanza una excepción.
+Después mide la categorización de `--distinct` descripciones distintas con y
+sin el índice, cada vez con un motor nuevo (sin memo).
+"""
+import argparse
+import random
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.sintetico import COMERCIOS
+from gastos.categorias import ENGINE, RuleEngine
+
+# (descripción, categoría esperada, palabra clave de la coincidencia aproximada o None).
+CASOS = [
+    ("STARBUKS COFFEE", "Cafeterias", "starbucks"),
+    ("LIVERPO", "Tiendas Departamentales", "liverpool"),
+    ("PALACIOHIERRO", "Palacio de Hierro", "palaciodehierro"),
+    ("HOMEDEPOT", "Hogar y Ferretería", "home depot"),
+    ("INTERESES", "Otros", None),
+    ("OXXO", "Conveniencia", None),
+    ("ZZZ QQQ 123456", "Otros", None),
+]
+
+
+def check(engine) -> list:
+    errors = []
+    for desc, categoria, comercio in CASOS:
+        try:
+            row = engine.match_details(pd.Series([desc])).iloc[0]
+        except Exception as e:  # noqa: BLE001 - cualquier excepción es un error del índice
+            errors.append(f"{desc!r}: {type(e).__name__}: {e}")
+            continue
+        found = row["Comercio"] if isinstance(row["Comercio"], str) else None
+        if row["Categoría"] != categoria or (comercio is not None and found != comercio):
+            errors.append(f"{desc!r}: {row['Categoría']} ({found}), se esperaba {categoria} ({comercio})")
+    return errors
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + word[i] + word[i:]
+
+
+def distinct_descriptions(n: int, seed: int = 0) -> pd.Series:
+    rng = random.Random(seed)
+    return pd.Series([
+        " ".join(_typo(w, rng) for w in rng.choice(COMERCIOS).split()) + f" {rng.randrange(10**5, 10**6)}"
+        for _ in range(n)
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.comercios", description="Coincidencias aproximadas de comercios.")
+    parser.add_argument("--distinct", type=int, default=30000, help="Descripciones distintas a categorizar")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    errors = check(ENGINE)
+    print(f"{len(CASOS) - len(errors)}/{len(CASOS)} casos correctos")
+
+    descripciones = distinct_descriptions(args.distinct, args.seed)
+    for label, threshold in (("sin índice", None), ("con índice", ENGINE.fuzzy_threshold)):
+        engine = RuleEngine(ENGINE.path, fuzzy_threshold=threshold)
+        start = time.perf_counter()
+        categorias = engine.match_series(descripciones)
+        elapsed = time.perf_counter() - start
+        print(f"{label:11} {elapsed:6.2f} s, {(categorias == engine.default).mean():6.1%} en '{engine.default}'")
+
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
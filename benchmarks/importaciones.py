@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Tiempo de importación (arranque en frío) con `python -X importtime`:
+
+    python -m benchmarks.importaciones
+    python -m benchmarks.importaciones --top 15 -o importaciones.json
+
+Cada objetivo se importa en un intérprete nuevo: los módulos del paquete que
+usa la CLI, los que importa la app (las líneas `import` de nivel superior de
+app_gastos_v6.py, sin correrla) y streamlit solo como referencia. Se reporta
+el tiempo acumulado de cada objetivo, sus módulos más lentos y si se cargó
+alguna dependencia pesada que debería importarse hasta usarse (código 1 si
+pasa).
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app_gastos_v6.py")
+
+# Se importan al abrir el primer PDF, al exportar o con varios procesos, nunca al arrancar.
+LAZY = ("pdfplumber", "pdfminer", "PIL", "pypdfium2", "xlsxwriter", "openpyxl", "multiprocessing")
+
+
+def app_imports() -> str:
+    """Las importaciones de nivel superior de la app, como código ejecutable."""
+    with open(APP, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+TARGETS = {
+    "gastos": "import gastos.cli",
+    "app": None,  # se arma con app_imports()
+    "streamlit": "import streamlit",
+}
+
+
+def import_times(code: str):
+    """[(módulo, nivel, propio_us, acumulado_us)] de importar `code` en un intérprete nuevo."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(APP), os.environ.get("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # El nombre va sangrado dos espacios por nivel de anidamiento.
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), level, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(rows, top: int):
+    # El total es la suma de los módulos de nivel 0; los demás ya están en su acumulado.
+    total = sum(cum for _, level, _, cum in rows if level == 0)
+    loaded = {name for name, _, _, _ in rows}
+    lazy = sorted(m for m in LAZY if m in loaded or any(n.startswith(m + ".") for n in loaded))
+    slowest = sorted(((name, cum) for name, _, _, cum in rows), key=lambda r: r[1], reverse=True)[:top]
+    return {"total_ms": total / 1000, "modulos": len(rows), "perezosos_cargados": lazy,
+            "mas_lentos_ms": [(name, cum / 1000) for name, cum in slowest]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.importaciones", description="Tiempo de importación en frío.")
+    parser.add_argument("--top", type=int, default=10, help="Módulos más lentos a mostrar por objetivo")
+    parser.add_argument("-o", "--output", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for target, code in TARGETS.items():
+        rows = import_times(code if code is not None else app_imports())
+        results[target] = r = report(rows, args.top)
+        print(f"{target}: {r['total_ms']:.0f} ms, {r['modulos']} módulos")
+        for name, ms in r["mas_lentos_ms"]:
+            print(f"    {ms:8.1f} ms  {name}")
+        if target != "streamlit" and r["perezosos_cargados"]:
+            print(f"    se cargaron al importar: {', '.join(r['perezosos_cargados'])}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 1 if any(r["perezosos_cargados"] for t, r in results.items() if t != "streamlit") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark del parser genérico de líneas (extraccion.match_line):
+
+    python -m benchmarks.lineas
+    python -m benchmarks.lineas --lines 10000 --repeat 7
+
+Arma un estado de cuenta de ~10k líneas como las que entrega un PDF real:
+transacciones sintéticas (BBVA y AMEX, con RFC/REF unidos) mezcladas con
+encabezados de página, saldos, totales y texto legal. Mide líneas/s de
+match_line contra la versión anterior (tres búsquedas por línea, sin filtro
+previo), que se conserva aquí como referencia, y termina con código 1 si
+alguna línea da un resultado distinto. La única diferencia esperada son las
+líneas cuya primera fecha se traslapa con el monto ("Página 1 de 24",
+ENCIMADAS), que la versión anterior tomaba como transacción y la actual
+descarta, igual que gastos.vectorizado; también falla si alguna de ENCIMADAS
+da una transacción en cualquiera de los dos parsers.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from benchmarks.sintetico import statement_pages, statement_text
+from gastos.extraccion import (
+    AMOUNT_PAT, CREDIT_WORDS, DATE_PAT, SPACES_PAT, date_parts, iter_lines, match_line, merge_continuations,
+)
+from gastos.vectorizado import parse_lines_frame
+
+# Renglones que no son transacciones, en la proporción de un estado real.
+BOILERPLATE = [
+    "Página {n} de 24",
+    "ESTADO DE CUENTA",
+    "Fecha de corte 15/ENE/2024",
+    "Saldo anterior 12,345.67",
+    "Pago mínimo para no generar intereses $ 1,250.00",
+    "Total de cargos del periodo",
+    "Fecha Operación Descripción Cargo Abono",
+    "Tasa de interés anual ordinaria 54.5 %",
+    "Para cualquier aclaración comuníquese al 55 5226 2663 o visite nuestra sucursal.",
+    "El CAT promedio sin IVA es informativo y sirve para fines de comparación.",
+    "Este documento es una representación impresa de un CFDI",
+    "RFC del emisor: BBA830831LJ2   Régimen fiscal 601",
+    "",
+    "  ",
+]
+
+# Líneas cuya fecha se come el principio del monto ("15 ENE 12" + ",345.67"):
+# no son transacciones, y el monto no debe salir recortado (345.67, 50.0, -0.0).
+ENCIMADAS = [
+    "15 ENE 12,345.67",
+    "15/01 12.50",
+    "15/01 99.00 CR",
+]
+
+
+def statement_lines(total: int = 10_000, seed: int = 0):
+    """~`total` líneas (ya unidas las continuaciones) de un estado con transacciones y texto fijo."""
+    rng = random.Random(seed)
+    lines = []
+    n = 0
+    while len(lines) < total:
+        issuer = "amex" if n % 2 else "bbva"
+        pages = statement_pages(1, 30, issuer, seed=seed + n)
+        page = list(merge_continuations(iter_lines(statement_text(pages))))
+        for _ in range(15):
+            page.insert(rng.randrange(len(page) + 1), rng.choice(BOILERPLATE).format(n=n + 1))
+        page.insert(rng.randrange(len(page) + 1), rng.choice(ENCIMADAS))
+        lines += page
+        n += 1
+    return lines[:total]
+
+
+def _parse_amount_anterior(raw: str):
+    s = raw.strip()
+    neg = False
+    if s.startswith("(") and s.endswith(")"):
+        neg = True
+        s = s[1:-1]
+    s = s.replace("$", "").replace(" ", "")
+    if re.search(r"\d+\.\d{3},\d{2}$", s):
+        s = s.replace(".", "").replace(",", ".")
+    else:
+        s = s.replace(",", "")
+    try:
+        val = float(s)
+        return -val if neg else val
+    except ValueError:
+        return None
+
+
+def match_line_anterior(line: str):
+    """match_line antes del patrón fusionado: referencia para tiempos y resultados."""
+    line_clean = SPACES_PAT.sub(" ", line).strip()
+    amount_match = AMOUNT_PAT.search(line_clean)
+    if not amount_match:
+        return None
+    amount = _parse_amount_anterior(amount_match.group(1))
+    if amount is None:
+        return None
+    if amount_match.group(2) or any(w in line_clean.lower() for w in CREDIT_WORDS):
+        amount = -abs(amount)
+    date_match = DATE_PAT.search(line_clean)
+    if not date_match:
+        return None
+    parts = date_parts(date_match)
+    if parts is None:
+        return None
+    desc_part = line_clean[:amount_match.start()]
+    desc_part = DATE_PAT.sub("", desc_part, count=1).strip(" -–—|")
+    return (*parts, desc_part, amount)
+
+
+def date_overlaps_amount(line: str) -> bool:
+    line_clean = SPACES_PAT.sub(" ", line).strip()
+    amount_match = AMOUNT_PAT.search(line_clean)
+    date_match = DATE_PAT.search(line_clean)
+    return bool(amount_match and date_match) and date_match.end() > amount_match.start()
+
+
+def lines_per_second(fn, lines, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            fn(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.lineas", description="Líneas/s del parser genérico.")
+    parser.add_argument("--lines", type=int, default=10_000, help="Líneas del estado de cuenta")
+    parser.add_argument("--repeat", type=int, default=5, help="Corridas por versión (se toma la más rápida)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    lines = statement_lines(args.lines, args.seed)
+    matched = sum(match_line(line) is not None for line in lines)
+    before = lines_per_second(match_line_anterior, lines, args.repeat)
+    after = lines_per_second(match_line, lines, args.repeat)
+    print(f"{len(lines):,} líneas, {matched:,} transacciones")
+    print(f"anterior  {before:12,.0f} líneas/s")
+    print(f"actual    {after:12,.0f} líneas/s  ({after / before:.2f}x)")
+
+    differences = []
+    discarded = 0
+    for line in lines:
+        if match_line(line) == match_line_anterior(line):
+            continue
+        if match_line(line) is None and date_overlaps_amount(line):
+            discarded += 1
+        else:
+            differences.append(line)
+    print(f"{discarded:,} líneas con la fecha encimada en el monto ya no cuentan como transacción")
+    for line in ENCIMADAS:
+        if match_line(line) is not None or len(parse_lines_frame([line], 2024)):
+            differences.append(line)
+    for line in differences[:10]:
+        print(f"Resultado distinto: {line!r}", file=sys.stderr)
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
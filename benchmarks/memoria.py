@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Memoria por fila de la tabla unificada sobre estados de cuenta sintéticos:
+
+    python -m benchmarks.memoria --files 20 --pages 25 --lines 45
+
+Compara la tabla compacta de build_transactions (Centavos enteros, texto de
+Arrow y categóricos) contra la misma tabla con columnas de objetos de Python
+y termina con código 1 si la compacta pasa de BYTES_PER_ROW_BUDGET bytes por
+fila, sin contar el texto de las descripciones.
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from benchmarks.bench import _regex_parse
+from benchmarks.sintetico import statement_files, statement_text
+from gastos.categorias import ENGINE
+from gastos.extraccion import iter_lines, merge_continuations
+from gastos.pipeline import BYTES_PER_ROW_BUDGET, build_transactions, display_frame
+
+
+def synthetic_transactions(files: int, pages: int, lines: int, seed: int = 0):
+    statements = statement_files(files, pages, lines, seed=seed)
+    merged = [list(merge_continuations(iter_lines(statement_text(p)))) for _, p in statements]
+    frames = [
+        (name, df.assign(Categoría=ENGINE.match_series(df["Descripción"])))
+        for (name, _), df in zip(statements, _regex_parse(merged))
+    ]
+    return build_transactions(frames)
+
+
+def measure(df_gastos):
+    """Bytes por fila (total y sin el texto de las descripciones) de la tabla compacta y de la de objetos."""
+    text = df_gastos["Descripción"].str.len().sum()  # ASCII en los sintéticos: 1 byte por carácter
+    objetos = display_frame(df_gastos).astype(object)
+    rows = len(df_gastos)
+    compacta = df_gastos.memory_usage(deep=True).sum()
+    return {
+        "filas": rows,
+        "compacta_por_fila": compacta / rows,
+        "compacta_sin_texto": (compacta - text) / rows,
+        "objetos_por_fila": objetos.memory_usage(deep=True).sum() / rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memoria", description="Memoria por fila de la tabla unificada.")
+    parser.add_argument("--files", type=int, default=20, help="Estados de cuenta (alternando BBVA y AMEX)")
+    parser.add_argument("--pages", type=int, default=25, help="Páginas por estado")
+    parser.add_argument("--lines", type=int, default=45, help="Líneas por página")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df_gastos = synthetic_transactions(args.files, args.pages, args.lines, args.seed)
+    m = measure(df_gastos)
+    print(f"{m['filas']:,} filas")
+    print(f"objetos             {m['objetos_por_fila']:8.1f} B/fila")
+    print(f"compacta            {m['compacta_por_fila']:8.1f} B/fila")
+    print(f"compacta sin texto  {m['compacta_sin_texto']:8.1f} B/fila (presupuesto {BYTES_PER_ROW_BUDGET})")
+    print(pd.Series(df_gastos.memory_usage(deep=True, index=False) / m["filas"]).round(1).to_string())
+    if m["compacta_sin_texto"] > BYTES_PER_ROW_BUDGET:
+        print("Se excede el presupuesto de memoria por fila", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
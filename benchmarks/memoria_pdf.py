@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Pico de memoria al leer lotes de PDFs con pdfplumber:
+
+    python -m benchmarks.memoria_pdf
+    python -m benchmarks.memoria_pdf --batches 1 8 32 --pages 40
+
+Escribe estados de cuenta sintéticos a disco y, para cada tamaño de lote, lee
+el lote en un proceso nuevo como lo hace la app: cada archivo se copia con
+UploadSpool y se extrae por ruta con el lector pdfplumber en un solo proceso.
+Reporta el pico de RSS (ru_maxrss) de cada lote y termina con código 1 si el
+lote más grande pasa al más chico por más de `--slack` MB: con una página
+abierta a la vez, el pico no debe depender de cuántos archivos se suban.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.sintetico import statement_files, statement_pdf
+
+
+def _maxrss_mb() -> float:
+    # Linux reporta KB; macOS, bytes.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def child(directory: str, batch: int) -> int:
+    """Lee los primeros `batch` PDFs de `directory` e imprime 'filas páginas segundos pico_mb'."""
+    from gastos.extraccion import extract_many
+    from gastos.subidas import UploadSpool
+
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))[:batch]
+    start = time.perf_counter()
+    spool = UploadSpool()
+    archivos = []
+    for path in paths:
+        with open(path, "rb") as f:
+            archivos.append(spool.add(f))
+    results = extract_many([(a.name, a.path) for a in archivos], workers=1, backend="pdfplumber")
+    elapsed = time.perf_counter() - start
+    spool.close()
+    rows = sum(0 if r.df is None else len(r.df) for r in results)
+    pages = sum(r.pages for r in results)
+    print(rows, pages, f"{elapsed:.3f}", f"{_maxrss_mb():.1f}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memoria_pdf", description="Pico de memoria por lote de PDFs.")
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 4, 16], help="Tamaños de lote")
+    parser.add_argument("--pages", type=int, default=30, help="Páginas por estado")
+    parser.add_argument("--lines", type=int, default=45, help="Líneas por página")
+    parser.add_argument("--slack", type=float, default=64, help="MB que puede crecer el pico del lote más grande")
+    parser.add_argument("--child", nargs=2, metavar=("DIR", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(args.child[0], int(args.child[1]))
+
+    batches = sorted(set(args.batches))
+    with tempfile.TemporaryDirectory(prefix="gastos_bench_") as directory:
+        for name, pages in statement_files(batches[-1], args.pages, args.lines):
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(statement_pdf(pages))
+        peaks = {}
+        print(f"{'lote':>5} {'páginas':>8} {'filas':>8} {'seg':>7} {'pico MB':>8}")
+        for batch in batches:
+            out = subprocess.run([sys.executable, "-m", "benchmarks.memoria_pdf", "--child", directory, str(batch)],
+                                 check=True, capture_output=True, text=True).stdout.split()
+            rows, pages, elapsed, peak = int(out[0]), int(out[1]), float(out[2]), float(out[3])
+            peaks[batch] = peak
+            print(f"{batch:>5} {pages:>8,} {rows:>8,} {elapsed:>7.2f} {peak:>8.1f}")
+
+    growth = peaks[batches[-1]] - peaks[batches[0]]
+    print(f"crecimiento del pico: {growth:+.1f} MB (margen {args.slack:.0f} MB)")
+    if growth > args.slack:
+        print("El pico de memoria crece con el tamaño del lote", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Detección de cargos recurrentes sobre un historial sintético de varios años:
+
+    python -m benchmarks.recurrentes
+    python -m benchmarks.recurrentes --years 5 --per-month 1500
+
+Mezcla compras sueltas de los comercios de benchmarks.sintetico con series
+conocidas: mensuales (con un mes sin cargo, con fecha que se mueve unos días o
+con aumento de precio), una anual y una suscripción cancelada. Mide el
+tiempo de detect_recurring y termina con código 1 si algún cargo de las
+series no se marca como recurrente, si una serie vigente no aparece con su
+cadencia y próximo cargo, si la cancelada aparece como vigente o si alguna
+compra suelta se marca como recurrente.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmarks.sintetico import COMERCIOS
+from gastos.categorias import ENGINE
+from gastos.pipeline import compact_transactions
+from gastos.recurrentes import CADENCES, detect_recurring
+
+END = date(2024, 12, 31)
+
+
+def _months_back(d: date, months: int) -> date:
+    month = d.month - 1 - months
+    return d.replace(year=d.year + month // 12, month=month % 12 + 1)
+
+
+def planted_series(years: int, rng: random.Random):
+    """[(descripción, cadencia, fechas, montos, vigente)]."""
+    months = 12 * years
+    series = []
+    # Mensual con aumento de precio a la mitad del historial.
+    dates = [_months_back(END.replace(day=15), k) for k in reversed(range(months))]
+    amounts = [219.0 if k < months // 2 else 249.0 for k in range(months)]
+    series.append(("NETFLIX MENSUALIDAD", "Mensual", dates, amounts, True))
+    # Mensual con la fecha de cobro corrida unos días.
+    dates = [_months_back(END.replace(day=3), k) + timedelta(days=rng.randint(0, 3)) for k in reversed(range(months))]
+    series.append(("SMARTFIT CUOTA", "Mensual", dates, [599.0] * months, True))
+    # Mensual con un mes sin cargo.
+    dates = [_months_back(END.replace(day=20), k) for k in reversed(range(months)) if k != 7]
+    series.append(("APPLE.COM/BILL ICLOUD", "Mensual", dates, [49.0] * len(dates), True))
+    # Anual.
+    dates = [date(END.year - k, 3, 10) for k in reversed(range(years))]
+    series.append(("QUALITAS SEGURO AUTO", "Anual", dates, [8450.0 * 1.03 ** k for k in range(years)], True))
+    # Cancelada hace un año: sus cargos son recurrentes pero ya no tiene próximo cargo.
+    dates = [_months_back(END.replace(day=8), k) for k in reversed(range(12, months))]
+    series.append(("DISNEY PLUS", "Mensual", dates, [159.0] * len(dates), False))
+    return series
+
+
+def synthetic_history(years: int = 4, per_month: int = 1000, seed: int = 0):
+    rng = random.Random(seed)
+    rows = []
+    start = _months_back(END, 12 * years)
+    span = (END - start).days
+    for _ in range(12 * years * per_month):
+        rows.append((start + timedelta(days=rng.randrange(span + 1)), rng.choice(COMERCIOS),
+                     round(rng.uniform(10, 2500), 2), False))
+    series = planted_series(years, rng)
+    for desc, _, dates, amounts, _ in series:
+        rows += [(d, f"{desc} REF {rng.randrange(10**6, 10**7)}", round(a, 2), True) for d, a in zip(dates, amounts)]
+    rng.shuffle(rows)
+    df = pd.DataFrame(rows, columns=["Fecha", "Descripción", "Monto", "_serie"])
+    df["Fecha"] = pd.to_datetime(df["Fecha"])
+    df["Categoría"] = ENGINE.match_series(df["Descripción"])
+    df["_archivo"] = "historial"
+    return compact_transactions(df), df["_serie"].to_numpy(), series
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.recurrentes", description="Detección de cargos recurrentes.")
+    parser.add_argument("--years", type=int, default=4, help="Años de historial")
+    parser.add_argument("--per-month", type=int, default=1000, help="Compras sueltas por mes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df_gastos, planted, series = synthetic_history(args.years, args.per_month, args.seed)
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        recurrente, proximos = detect_recurring(df_gastos)
+        times.append(time.perf_counter() - start)
+    print(f"{len(df_gastos):,} transacciones, {recurrente.sum():,} recurrentes, {len(proximos)} series vigentes "
+          f"en {min(times):.3f} s")
+    print(proximos.to_string(index=False))
+
+    errors = []
+    falsos = int((recurrente.to_numpy() & ~planted).sum())
+    if falsos:
+        errors.append(f"{falsos} compras sueltas marcadas como recurrentes")
+    for desc, cadencia, dates, _, vigente in series:
+        mask = df_gastos["Descripción"].str.startswith(desc).to_numpy()
+        if not recurrente.to_numpy()[mask].all():
+            errors.append(f"{desc}: no todos sus cargos se marcaron como recurrentes")
+        found = proximos[proximos["Descripción"].str.startswith(desc)]
+        if not vigente:
+            if not found.empty:
+                errors.append(f"{desc}: cancelada pero aparece como vigente")
+            continue
+        proximo = pd.Timestamp(dates[-1]) + pd.DateOffset(months=CADENCES[cadencia][0])
+        if len(found) != 1:
+            errors.append(f"{desc}: {len(found)} series vigentes, se esperaba una")
+        elif found["Cadencia"].iloc[0] != cadencia or found["Próximo cargo"].iloc[0] != proximo:
+            errors.append(f"{desc}: {found['Cadencia'].iloc[0]} {found['Próximo cargo'].iloc[0]:%Y-%m-%d}, "
+                          f"se esperaba {cadencia} {proximo:%Y-%m-%d}")
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Estados de cuenta sintéticos (BBVA y AMEX) para benchmarks.
+
+Las líneas siguen las formas que reconocen DATE_PAT y AMOUNT_PAT:
+fechas "12/ENE/2024", "12 ENE" y "12-01-24"; montos "1,234.56",
+"$ 89.00", "(1,234.56)", "500.00 CR" y "1.234,56"; y en AMEX líneas de
+continuación RFC/REF que se unen a la anterior. El generador es
+determinista para una misma semilla.
+
+Las líneas de transacción son tuplas (fecha, descripción, monto) y las de
+continuación ("", "RFC ..."): en el PDF cada campo va en su columna, como en
+los estados reales, y en el texto se unen con espacios.
+"""
+import random
+
+MESES = ["ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"]
+
+COMERCIOS = [
+    "OXXO SUC 1234", "UBER EATS MX", "NETFLIX.COM", "SPOTIFY P0F3A", "AMAZON MX MARKETPLACE",
+    "STARBUCKS SATELITE", "PEMEX ES 4512", "WAL-MART SATELITE", "LIVERPOOL PERISUR",
+    "CINEPOLIS ANDARES", "FARMACIAS DEL AHORRO", "THE HOME DEPOT NAUCALPAN", "TELMEX PAGO SERV",
+    "RAPPI RESTAURANTES", "VOLARIS WEB", "TICKETMASTER MX", "GANDHI MIXCOAC", "IZZI TELECOM",
+    "TAQUERIA EL GUERO", "PAPELERIA LA ESTRELLA", "CONSULTORIO DENTAL", "LAVANDERIA ROMA",
+]
+
+ABONOS = ["PAGO RECIBIDO GRACIAS", "ABONO SPEI", "DEPOSITO EN EFECTIVO"]
+
+# Posición x (puntos) de las columnas fecha, descripción y monto en el PDF.
+COLUMN_X = (30, 110, 470)
+
+
+def _amount(rng: random.Random) -> str:
+    value = rng.choice([rng.uniform(10, 999), rng.uniform(1000, 25000)])
+    kind = rng.random()
+    if kind < 0.08:
+        return f"({value:,.2f})"
+    if kind < 0.14:
+        return f"{value:,.2f} CR"
+    if kind < 0.22:
+        # Formato europeo: miles con punto, decimales con coma.
+        return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    if kind < 0.40:
+        return f"$ {value:,.2f}"
+    return f"{value:,.2f}"
+
+
+def _date(rng: random.Random, year: int, issuer: str) -> str:
+    day, month = rng.randint(1, 28), rng.randint(1, 12)
+    if issuer == "amex":
+        return f"{day:02d} {MESES[month - 1]}"
+    if rng.random() < 0.3:
+        return f"{day:02d}-{month:02d}-{year % 100:02d}"
+    return f"{day:02d}/{MESES[month - 1]}/{year}"
+
+
+def statement_pages(pages: int = 5, lines_per_page: int = 40, issuer: str = "bbva",
+                    year: int = 2024, seed: int = 0):
+    """Líneas de texto de cada página de un estado de cuenta sintético."""
+    rng = random.Random(seed)
+    result = []
+    for n in range(pages):
+        lines = []
+        if n == 0:
+            banco = "AMERICAN EXPRESS" if issuer == "amex" else "BBVA MEXICO"
+            lines += [banco, f"Periodo del 01/01/{year} al 31/12/{year}", "Fecha Descripcion Importe"]
+        while len(lines) < lines_per_page:
+            if rng.random() < 0.05:
+                desc = rng.choice(ABONOS)
+            else:
+                desc = rng.choice(COMERCIOS)
+            lines.append((_date(rng, year, issuer), desc, _amount(rng)))
+            if issuer == "amex" and rng.random() < 0.25 and len(lines) < lines_per_page:
+                prefix = rng.choice(["RFC", "REF"])
+                lines.append(("", f"{prefix} {rng.randrange(10**11, 10**12)}"))
+        result.append(lines)
+    return result
+
+
+def statement_text(pages) -> list:
+    """Texto de cada página, como lo entregaría pdfplumber."""
+    return ["\n".join(_join(line) for line in lines) for lines in pages]
+
+
+def _join(line) -> str:
+    return line if isinstance(line, str) else " ".join(field for field in line if field)
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def statement_pdf(pages) -> bytes:
+    """PDF mínimo (Helvetica, un renglón por línea, transacciones en columnas) con las páginas dadas."""
+    objects = []
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    parent = add(b"")
+    kids = []
+    for lines in pages:
+        ops = ["BT /F1 8 Tf"]
+        for n, line in enumerate(lines):
+            y = 810 - 10 * n
+            fields = [line] if isinstance(line, str) else line
+            ops += [f"1 0 0 1 {x} {y} Tm ({_escape(field)}) Tj" for x, field in zip(COLUMN_X, fields) if field]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+                        b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (parent, font, content)))
+    objects[parent - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % parent)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def statement_files(files: int = 2, pages: int = 5, lines_per_page: int = 40, seed: int = 0):
+    """(nombre, páginas) de varios estados, alternando BBVA y AMEX."""
+    result = []
+    for i in range(files):
+        issuer = "bbva" if i % 2 == 0 else "amex"
+        result.append((f"{issuer}_{i:03d}.pdf", statement_pages(pages, lines_per_page, issuer, seed=seed + i)))
+    return result
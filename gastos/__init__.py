@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Lógica compartida del clasificador de gastos (caché, extracción, categorías)."""
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Resúmenes que se actualizan por deltas en lugar de recalcularse.
+
+RunningAggregates mantiene los totales por categoría y la matriz
+Mes x Categoría en centavos enteros (sin deriva de flotantes). Agregar o
+quitar un archivo sólo suma o resta su propia contribución, y recategorizar
+filas mueve sus montos de una celda a otra; `by_category()` y `pivot()`
+se construyen a partir de las celdas, no de las transacciones.
+"""
+from collections import Counter
+
+import pandas as pd
+
+from gastos.pipeline import CATEGORIAS_A_EXCLUIR, to_cents
+
+
+def _row_cents(df: pd.DataFrame) -> pd.Series:
+    """Centavos de cada fila, ya sea de la tabla compacta (Centavos) o de un archivo (Monto)."""
+    return df["Centavos"] if "Centavos" in df.columns else to_cents(df["Monto"])
+
+
+class RunningAggregates:
+    """Totales de gasto (monto > 0, sin categorías excluidas) por archivo, mes y categoría."""
+
+    def __init__(self, excluir=CATEGORIAS_A_EXCLUIR):
+        self.excluir = set(excluir)
+        self._cells = Counter()
+        self._files = {}
+
+    def __contains__(self, file_id):
+        return file_id in self._files
+
+    @property
+    def files(self):
+        return set(self._files)
+
+    def _contribution(self, df: pd.DataFrame, categorias: pd.Series) -> Counter:
+        centavos = _row_cents(df)
+        gasto = (centavos > 0) & ~categorias.isin(self.excluir)
+        if not gasto.any():
+            return Counter()
+        cells = pd.DataFrame({
+            "Mes": df.loc[gasto, "Fecha"].dt.to_period("M"),
+            "Categoría": categorias[gasto].astype(str),
+            "centavos": centavos[gasto],
+        }).groupby(["Mes", "Categoría"], observed=True)["centavos"].sum()
+        return Counter(cells.to_dict())
+
+    def _apply(self, delta: Counter, sign: int):
+        for cell, cents in delta.items():
+            total = self._cells[cell] + sign * cents
+            if total:
+                self._cells[cell] = total
+            else:
+                del self._cells[cell]
+
+    def add_file(self, file_id, df: pd.DataFrame, categorias: pd.Series = None):
+        """Suma la contribución de un archivo (reemplaza la anterior si ya estaba)."""
+        if file_id in self._files:
+            self.remove_file(file_id)
+        categorias = df["Categoría"] if categorias is None else categorias
+        delta = self._contribution(df, categorias)
+        self._files[file_id] = delta
+        self._apply(delta, +1)
+
+    def remove_file(self, file_id):
+        delta = self._files.pop(file_id, None)
+        if delta is not None:
+            self._apply(delta, -1)
+
+    def sync(self, file_ids):
+        """Quita los archivos que ya no están en `file_ids`."""
+        for file_id in self.files - set(file_ids):
+            self.remove_file(file_id)
+
+    def recategorize(self, file_id, df: pd.DataFrame, old: pd.Series, new: pd.Series):
+        """Mueve entre celdas los montos de las filas cuya categoría cambió de `old` a `new`."""
+        changed = old != new
+        if file_id not in self._files or not changed.any():
+            return
+        rows = df[changed]
+        before = self._contribution(rows, old[changed])
+        after = self._contribution(rows, new[changed])
+        delta = self._files[file_id]
+        self._apply(before, -1)
+        self._apply(after, +1)
+        delta.subtract(before)
+        delta.update(after)
+        for cell in [cell for cell, cents in delta.items() if not cents]:
+            del delta[cell]
+
+    def by_category(self) -> pd.DataFrame:
+        """Mismo formato que resumen_cat de summarize()."""
+        totals = Counter()
+        for (_, categoria), cents in self._cells.items():
+            totals[categoria] += cents
+        df = pd.DataFrame({"Categoría": list(totals), "centavos": list(totals.values())}, columns=["Categoría", "centavos"])
+        df = df.sort_values("centavos", ascending=False, kind="stable").reset_index(drop=True)
+        return pd.DataFrame({"Categoría": df["Categoría"], "Monto": df["centavos"] / 100})
+
+    def pivot(self) -> pd.DataFrame:
+        """Mismo formato que el pivot Mes x Categoría de summarize()."""
+        if not self._cells:
+            return pd.DataFrame(index=pd.PeriodIndex([], freq="M", name="Mes"))
+        cells = pd.Series(self._cells)
+        cells.index.names = ["Mes", "Categoría"]
+        pivot = cells.unstack("Categoría", fill_value=0).sort_index(axis=0).sort_index(axis=1) / 100
+        pivot.index = pd.PeriodIndex(pivot.index, freq="M", name="Mes")
+        return pivot
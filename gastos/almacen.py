@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Historial local de transacciones en SQLite.
+
+Cada estado de cuenta se registra por el SHA-256 de sus bytes, así que volver
+a subirlo no hace nada. Las transacciones se deduplican por (fecha, monto,
+descripción normalizada, ocurrencia): si dos estados de cuenta se traslapan,
+la misma compra se guarda una sola vez, pero dos compras idénticas dentro de
+un mismo estado (ocurrencia 0 y 1) se conservan. Los resúmenes se calculan
+con consultas sobre los índices de fecha, mes y categoría.
+"""
+import re
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from gastos.pipeline import CATEGORIAS_A_EXCLUIR, compact_transactions, to_cents
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    hash TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    ingerido TEXT NOT NULL,
+    filas INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transacciones (
+    id INTEGER PRIMARY KEY,
+    archivo_hash TEXT NOT NULL REFERENCES archivos(hash),
+    fecha TEXT NOT NULL,
+    mes TEXT NOT NULL,
+    descripcion TEXT NOT NULL,
+    descripcion_norm TEXT NOT NULL,
+    ocurrencia INTEGER NOT NULL,
+    centavos INTEGER NOT NULL,
+    categoria TEXT NOT NULL,
+    UNIQUE (fecha, centavos, descripcion_norm, ocurrencia)
+);
+CREATE INDEX IF NOT EXISTS idx_transacciones_fecha ON transacciones (fecha);
+CREATE INDEX IF NOT EXISTS idx_transacciones_mes ON transacciones (mes);
+CREATE INDEX IF NOT EXISTS idx_transacciones_categoria ON transacciones (categoria);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_description(desc: str) -> str:
+    """Minúsculas, sin las líneas RFC/REF anexadas (" | ...") y con espacios colapsados."""
+    return _SPACES.sub(" ", desc.split(" | ", 1)[0].lower()).strip()
+
+
+class TransactionStore:
+    """Base de datos SQLite con el historial de transacciones ya categorizadas."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def has_file(self, file_hash: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM archivos WHERE hash = ?", (file_hash,)).fetchone()
+        return row is not None
+
+    def ingest(self, file_hash: str, name: str, df: pd.DataFrame) -> int:
+        """
+        Guarda las transacciones categorizadas de un archivo (columnas Fecha,
+        Descripción, Monto o Centavos, Categoría). Regresa cuántas filas nuevas se
+        insertaron; 0 si el archivo ya estaba o todo eran duplicados.
+        """
+        if self.has_file(file_hash):
+            return 0
+        rows = pd.DataFrame({
+            "fecha": df["Fecha"].dt.strftime("%Y-%m-%d"),
+            "mes": df["Fecha"].dt.strftime("%Y-%m"),
+            "descripcion": df["Descripción"].astype(object),
+            "descripcion_norm": df["Descripción"].astype(object).map(normalize_description),
+            "centavos": df["Centavos"] if "Centavos" in df.columns else to_cents(df["Monto"]),
+            "categoria": df["Categoría"].astype(object),
+        })
+        rows["ocurrencia"] = rows.groupby(["fecha", "centavos", "descripcion_norm"]).cumcount()
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO transacciones "
+                "(archivo_hash, fecha, mes, descripcion, descripcion_norm, ocurrencia, centavos, categoria) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (file_hash, r.fecha, r.mes, r.descripcion, r.descripcion_norm, int(r.ocurrencia), int(r.centavos), r.categoria)
+                    for r in rows.itertuples(index=False)
+                ),
+            )
+            inserted = self.conn.total_changes - before
+            self.conn.execute(
+                "INSERT INTO archivos (hash, nombre, ingerido, filas) VALUES (?, ?, ?, ?)",
+                (file_hash, name, datetime.now().isoformat(timespec="seconds"), inserted),
+            )
+        return inserted
+
+    def counts(self):
+        """(archivos, transacciones) en el historial."""
+        n_files = self.conn.execute("SELECT COUNT(*) FROM archivos").fetchone()[0]
+        n_rows = self.conn.execute("SELECT COUNT(*) FROM transacciones").fetchone()[0]
+        return n_files, n_rows
+
+    def transactions(self) -> pd.DataFrame:
+        """Historial completo en la misma tabla compacta que build_transactions."""
+        df = pd.read_sql_query(
+            "SELECT t.fecha, t.descripcion, t.centavos, t.categoria, a.nombre "
+            "FROM transacciones t JOIN archivos a ON a.hash = t.archivo_hash ORDER BY t.fecha, t.id",
+            self.conn,
+        )
+        return compact_transactions(pd.DataFrame({
+            "Fecha": pd.to_datetime(df["fecha"], format="%Y-%m-%d"),
+            "Descripción": df["descripcion"],
+            "Centavos": df["centavos"],
+            "Categoría": df["categoria"],
+            "_archivo": df["nombre"],
+        }))
+
+    def _expense_filter(self, excluir):
+        placeholders = ", ".join("?" for _ in excluir)
+        clause = "centavos > 0"
+        if excluir:
+            clause += f" AND categoria NOT IN ({placeholders})"
+        return clause, list(excluir)
+
+    def summary_by_category(self, excluir=CATEGORIAS_A_EXCLUIR) -> pd.DataFrame:
+        """Equivalente a resumen_cat de summarize(), calculado en SQL."""
+        clause, params = self._expense_filter(excluir)
+        df = pd.read_sql_query(
+            f"SELECT categoria AS Categoría, SUM(centavos) AS centavos FROM transacciones "
+            f"WHERE {clause} GROUP BY categoria ORDER BY centavos DESC",
+            self.conn, params=params,
+        )
+        return pd.DataFrame({"Categoría": df["Categoría"], "Monto": df["centavos"] / 100})
+
+    def summary_by_month_category(self, excluir=CATEGORIAS_A_EXCLUIR) -> pd.DataFrame:
+        """Equivalente al pivot Mes x Categoría de summarize(), calculado en SQL."""
+        clause, params = self._expense_filter(excluir)
+        df = pd.read_sql_query(
+            f"SELECT mes, categoria, SUM(centavos) AS centavos FROM transacciones "
+            f"WHERE {clause} GROUP BY mes, categoria",
+            self.conn, params=params,
+        )
+        pivot = df.pivot(index="mes", columns="categoria", values="centavos").fillna(0) / 100
+        pivot.index = pd.PeriodIndex(pivot.index, freq="M", name="Mes")
+        pivot.columns.name = "Categoría"
+        return pivot.sort_index()
+
+    def rules_version(self):
+        row = self.conn.execute("SELECT valor FROM meta WHERE clave = 'reglas'").fetchone()
+        return row[0] if row else None
+
+    def recategorize(self, engine) -> int:
+        """Aplica las reglas vigentes de `engine` a todo el historial. Regresa filas cambiadas."""
+        # La versión que se guarda es la misma con la que se categorizó, aunque otra sesión recargue las reglas.
+        ruleset = engine.ruleset
+        if self.rules_version() == ruleset.version:
+            return 0
+        df = pd.read_sql_query("SELECT id, descripcion, categoria FROM transacciones", self.conn)
+        nuevas = engine.match_series(df["descripcion"], ruleset)
+        mask = nuevas != df["categoria"]
+        changed = pd.DataFrame({"id": df.loc[mask, "id"], "categoria": nuevas[mask]})
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE transacciones SET categoria = ? WHERE id = ?",
+                ((r.categoria, int(r.id)) for r in changed.itertuples(index=False)),
+            )
+            self.conn.execute(
+                "INSERT INTO meta (clave, valor) VALUES ('reglas', ?) "
+                "ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor",
+                (ruleset.version,),
+            )
+        return len(changed)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de PDFs ya procesados.
+
+La llave combina el SHA-256 de los bytes del archivo (calculado al copiarlo a
+disco, ver gastos.subidas) con la versión del parser, así que un PDF sin
+cambios nunca se vuelve a leer con pdfplumber. Las entradas
+viven en memoria con desalojo LRU acotado por tamaño y, opcionalmente, en un
+directorio local para sobrevivir reinicios de Streamlit, con los mismos
+límites; las entradas de versiones anteriores del parser ya no se leen y
+salen primero por antigüedad. Todas las
+operaciones toman un candado, así que una sola instancia puede compartirse
+entre sesiones.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def hash_cache_key(sha256: str, parser_version: str) -> str:
+    """Llave de un archivo cuyo SHA-256 ya se conoce (p. ej. calculado al copiarlo a disco)."""
+    return hashlib.sha256(f"{parser_version}\0{sha256}".encode("utf-8")).hexdigest()
+
+
+def _frame_size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ParseCache:
+    """
+    Caché LRU de DataFrames extraídos, acotado por número de entradas y bytes.
+
+    Si se indica `disk_dir`, cada entrada también se guarda como pickle en ese
+    directorio; un fallo en memoria se busca ahí antes de reprocesar el PDF.
+    El directorio se acota a `max_entries` archivos y `max_bytes` bytes,
+    desalojando por fecha de último uso (mtime).
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024, disk_dir: str = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._prune_disk()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        path = self._disk_path(key)
+        return key in self._entries or bool(path and os.path.exists(path))
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _disk_path(self, key: str):
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key: str):
+        """Regresa una copia del DataFrame guardado o None si no existe."""
+        with self._lock:
+            df = self._entries.get(key)
+            if df is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return df.copy()
+        path = self._disk_path(key)
+        if path and os.path.exists(path):
+            try:
+                df = pd.read_pickle(path)
+            except Exception:
+                # Entrada corrupta, de otra versión de pandas o borrada por otra sesión: se descarta.
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            else:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                with self._lock:
+                    self._remember(key, df)
+                    self.hits += 1
+                return df.copy()
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        with self._lock:
+            self._remember(key, df.copy())
+        path = self._disk_path(key)
+        if path:
+            # Nombre temporal propio del hilo: dos sesiones pueden guardar el mismo PDF a la vez.
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_pickle(tmp)
+            os.replace(tmp, path)
+            self._prune_disk()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def _prune_disk(self):
+        """Borra los pickles menos usados hasta respetar los límites de entradas y bytes."""
+        files = []
+        try:
+            with os.scandir(self.disk_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".pkl"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return
+        files.sort()
+        count, total = len(files), sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Ya la borró otra sesión.
+                pass
+            count -= 1
+            total -= size
+
+    def _remember(self, key: str, df: pd.DataFrame):
+        if key in self._entries:
+            self._total_bytes -= self._sizes.pop(key)
+            del self._entries[key]
+        size = _frame_size(df)
+        self._entries[key] = df
+        self._sizes[key] = size
+        self._total_bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            old_key, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(old_key)
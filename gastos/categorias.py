@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+"""
+Categorización de descripciones con un autómata Aho–Corasick.
+
+Las reglas viven en un archivo JSON (reglas_categorias.json) que se valida y
+se compila en un trie con ligas de falla; cada descripción se recorre una
+vez, sin importar cuántas palabras clave haya. Cuando varias reglas coinciden
+gana la que aparece primero en la tabla, igual que la antigua cadena de `elif`.
+
+Las descripciones se comparan en minúsculas, así que una palabra clave con
+mayúsculas (p. ej. "AT&T" en Servicios) nunca coincide.
+
+Antes de categorizar, cada descripción se reduce a una clave de comercio
+(`MerchantKeys`: sin el texto RFC/REF unido con " | " ni números de
+referencia o fechas), y la categoría de cada clave se recuerda en un LRU del
+proceso, con la versión de las reglas en la llave, que se vacía cuando la
+versión cambia.
+
+Las claves que no contienen ninguna palabra clave se comparan contra un
+índice de trigramas de las palabras clave (`MerchantIndex`): "STARBUKS" o
+"LIVERPO" toman la categoría del comercio más parecido si la similitud pasa
+de FUZZY_THRESHOLD, y esa similitud queda como la confianza de la categoría.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+
+import pandas as pd
+
+DEFAULT_CATEGORY = "Otros"
+
+# Tabla de reglas por defecto; GASTOS_REGLAS permite apuntar a otro archivo.
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reglas_categorias.json")
+
+# Versiones anteriores que se recuerdan para recategorizar de forma incremental.
+_MAX_HISTORY = 8
+
+# Claves de comercio cuya categoría se recuerda (compartido entre reruns y sesiones).
+MEMO_SIZE = 50000
+
+_CONTINUATION = re.compile(r"\s*\|.*$", re.DOTALL)
+
+# Similitud de trigramas (Jaccard) mínima para una coincidencia aproximada y
+# letras mínimas de una palabra clave para entrar al índice ("bp", "f1" o
+# "tag" coincidirían con casi cualquier cosa).
+FUZZY_THRESHOLD = 0.55
+FUZZY_MIN_CHARS = 5
+
+
+def load_rules(path: str):
+    """
+    Lee y valida un archivo de reglas JSON.
+
+    Formato: {"default": "Otros", "reglas": [{"categoria": ..., "palabras": [...]}, ...]}
+    El orden de "reglas" es la prioridad. Regresa (reglas, default, version), donde
+    reglas es una lista de (categoria, [palabras]) y version el hash del contenido.
+    """
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    try:
+        data = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"{path}: JSON inválido: {e}") from e
+    if not isinstance(data, dict) or not isinstance(data.get("reglas"), list) or not data["reglas"]:
+        raise ValueError(f"{path}: se esperaba un objeto con una lista 'reglas' no vacía")
+    default = data.get("default", DEFAULT_CATEGORY)
+    if not isinstance(default, str) or not default.strip():
+        raise ValueError(f"{path}: 'default' debe ser un texto no vacío")
+    rules = []
+    seen = set()
+    for i, entry in enumerate(data["reglas"], start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"{path}: la regla {i} no es un objeto")
+        category = entry.get("categoria")
+        keywords = entry.get("palabras")
+        if not isinstance(category, str) or not category.strip():
+            raise ValueError(f"{path}: la regla {i} no tiene 'categoria'")
+        if category in seen:
+            raise ValueError(f"{path}: la categoría '{category}' está repetida")
+        if not isinstance(keywords, list) or not keywords or not all(isinstance(k, str) and k for k in keywords):
+            raise ValueError(f"{path}: la regla '{category}' necesita una lista 'palabras' de textos no vacíos")
+        seen.add(category)
+        rules.append((category, list(keywords)))
+    version = hashlib.sha256(raw).hexdigest()[:12]
+    return rules, default, version
+
+
+def first_changed_rule(old_rules, old_default, new_rules, new_default):
+    """
+    Índice de la primera regla distinta entre dos tablas, o None si son iguales.
+
+    Una fila cuya categoría tiene prioridad menor a ese índice no puede cambiar:
+    su regla sigue coincidiendo y ninguna regla anterior cambió.
+    """
+    for i, (old, new) in enumerate(zip(old_rules, new_rules)):
+        if old != new:
+            return i
+    if len(old_rules) != len(new_rules) or old_default != new_default:
+        return min(len(old_rules), len(new_rules))
+    return None
+
+
+class KeywordMatcher:
+    """
+    Autómata Aho–Corasick sobre las palabras clave de una tabla de reglas.
+
+    Cada nodo guarda la mejor prioridad (índice de regla más bajo) que termina
+    en él o en cualquier sufijo alcanzable por sus ligas de falla, así que un
+    solo recorrido del texto basta para conocer la regla ganadora.
+    """
+
+    _NO_MATCH = None
+
+    def __init__(self, rules, default=DEFAULT_CATEGORY):
+        self.categories = [category for category, _ in rules]
+        self.default = default
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [self._NO_MATCH]
+        for priority, (_, keywords) in enumerate(rules):
+            for keyword in keywords:
+                self._add(keyword, priority)
+        self._build_fail_links()
+
+    def _add(self, keyword: str, priority: int):
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(self._NO_MATCH)
+            node = nxt
+        if self._best[node] is None or priority < self._best[node]:
+            self._best[node] = priority
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+
+    def best_priority(self, text: str):
+        """Índice de la regla ganadora en `text` (ya en minúsculas) o None."""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        best = None
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = best_at[node]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+                if best == 0:
+                    break
+        return best
+
+    def match(self, descripcion: str) -> str:
+        priority = self.best_priority(descripcion.lower())
+        return self.default if priority is None else self.categories[priority]
+
+
+class MerchantKeys:
+    """
+    Clave estable de comercio: "UBER EATS 12/01/2024 REF 83910 | RFC UEM1204"
+    -> "uber eats ref". Se quita lo que sigue a " | " y las palabras con tres o
+    más dígitos (referencias, fechas, montos, RFC), salvo las que contienen
+    una palabra clave con tres o más dígitos ("abts 15111", "g500"). La clave
+    de una clave es ella misma.
+    """
+
+    def __init__(self, rules):
+        self.protected = tuple(sorted({
+            token for _, keywords in rules for keyword in keywords for token in keyword.lower().split()
+            if sum(ch.isdigit() for ch in token) >= 3
+        }))
+
+    def _keep(self, token: str) -> bool:
+        if sum(ch.isdigit() for ch in token) < 3:
+            return True
+        return any(fragment in token for fragment in self.protected)
+
+    def key(self, descripcion: str) -> str:
+        text = _CONTINUATION.sub("", descripcion.lower())
+        tokens = text.split()
+        return " ".join(token for token in tokens if self._keep(token)) or " ".join(tokens)
+
+
+def trigrams(text: str) -> set:
+    """Trigramas de cada palabra con relleno de espacios, como pg_trgm: "oxxo" -> "  o", " ox", ..., "xo "."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class MerchantIndex:
+    """
+    Índice invertido trigrama -> palabras clave, para encontrar el comercio
+    conocido más parecido a una clave sin comparar contra toda la tabla.
+
+    Cada palabra clave (sin sus números de tres o más dígitos) se compara con
+    las ventanas de palabras consecutivas de la clave que tienen una palabra
+    más, igual o una menos que ella, unidas sin espacios ("wal mart" y
+    "walmart" son lo mismo); la similitud es la de Jaccard entre sus
+    trigramas. Sólo se evalúan las palabras clave que comparten suficientes
+    trigramas con alguna ventana para poder pasar del umbral.
+    """
+
+    def __init__(self, rules, threshold: float = FUZZY_THRESHOLD, min_chars: int = FUZZY_MIN_CHARS):
+        self.threshold = threshold
+        self.names = []
+        self._entries = []
+        self._postings = defaultdict(list)
+        self._max_words = 1
+        seen = set()
+        for priority, (_, keywords) in enumerate(rules):
+            for keyword in keywords:
+                if keyword != keyword.lower():
+                    continue  # nunca coincide de forma exacta; tampoco aproximada
+                name = " ".join(t for t in keyword.split() if sum(ch.isdigit() for ch in t) < 3)
+                if len(name.replace(" ", "")) < min_chars or name in seen:
+                    continue
+                seen.add(name)
+                grams = trigrams(name.replace(" ", ""))
+                entry = len(self._entries)
+                self.names.append(name)
+                self._entries.append((priority, len(name.split()), grams))
+                self._max_words = max(self._max_words, len(name.split()))
+                for gram in grams:
+                    self._postings[gram].append(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def nearest(self, key: str):
+        """(prioridad, palabra clave, similitud) del comercio más parecido a `key`, o None."""
+        tokens = key.split()
+        windows = {}
+        for size in range(1, min(len(tokens), self._max_words + 1) + 1):
+            for start in range(len(tokens) - size + 1):
+                windows[(start, size)] = trigrams("".join(tokens[start:start + size]))
+        shared = Counter()
+        for gram in set().union(*windows.values()):
+            shared.update(self._postings.get(gram, ()))
+        best = None
+        for entry, common in shared.items():
+            priority, words, grams = self._entries[entry]
+            # La intersección con cualquier ventana es a lo más `common` y la unión al menos len(grams).
+            if common < self.threshold * len(grams):
+                continue
+            score = max((
+                len(grams & window) / len(grams | window)
+                for (_, size), window in windows.items() if words - 1 <= size <= words + 1
+            ), default=0.0)  # la clave puede tener menos palabras de las que admite la palabra clave
+            if score >= self.threshold and (best is None or (score, -priority) > (best[2], -best[0])):
+                best = (priority, self.names[entry], score)
+        return best
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """Una versión de las reglas con todo lo que se compila de ella; nunca se modifica."""
+    version: str
+    rules: list
+    default: str
+    matcher: KeywordMatcher
+    keys: MerchantKeys
+    fuzzy: MerchantIndex = None
+
+    def match_key(self, key: str):
+        """(categoría, palabra clave, confianza) de una clave de comercio."""
+        priority = self.matcher.best_priority(key)
+        if priority is not None:
+            return self.rules[priority][0], None, 1.0
+        near = self.fuzzy.nearest(key) if self.fuzzy is not None else None
+        if near is None:
+            return self.default, None, 0.0
+        priority, name, score = near
+        return self.rules[priority][0], name, round(score, 3)
+
+
+class RuleEngine:
+    """
+    Reglas cargadas de un archivo JSON y compiladas en un KeywordMatcher.
+
+    `maybe_reload()` revisa el mtime del archivo y recompila si cambió; si el
+    archivo nuevo no es válido se conservan las reglas anteriores y el error
+    queda en `last_error`. `recategorize()` sólo vuelve a evaluar las filas
+    que el cambio de reglas puede afectar.
+
+    Si ninguna palabra clave coincide, la clave se busca en un MerchantIndex
+    (salvo con `fuzzy_threshold=None`); `match_details()` reporta para cada
+    descripción la palabra clave usada y la confianza (1.0 exacta, la
+    similitud si es aproximada, 0.0 si quedó en el default).
+
+    `match()` categoriza la clave de comercio de la descripción y recuerda el
+    resultado en un LRU de hasta `memo_size` entradas (con candado: el motor se
+    comparte entre sesiones de Streamlit). El LRU guarda tanto la clave como
+    la descripción original, así que una descripción repetida no se vuelve a
+    normalizar.
+
+    Cada versión de las reglas es un RuleSet inmutable que se reemplaza con
+    una sola asignación: una categorización que empezó con la versión anterior
+    la usa completa, y las entradas del LRU llevan la versión en la llave, así
+    que nunca se sirven con otra.
+    """
+
+    def __init__(self, path: str = None, memo_size: int = MEMO_SIZE, fuzzy_threshold: float = FUZZY_THRESHOLD):
+        self.path = path or os.environ.get("GASTOS_REGLAS") or DEFAULT_RULES_PATH
+        self.fuzzy_threshold = fuzzy_threshold
+        self.last_error = None
+        self.memo_size = memo_size
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._history = OrderedDict()
+        self._load(os.stat(self.path).st_mtime_ns)
+
+    @property
+    def ruleset(self) -> RuleSet:
+        return self._ruleset
+
+    @property
+    def rules(self):
+        return self._ruleset.rules
+
+    @property
+    def default(self) -> str:
+        return self._ruleset.default
+
+    @property
+    def version(self) -> str:
+        return self._ruleset.version
+
+    @property
+    def matcher(self) -> KeywordMatcher:
+        return self._ruleset.matcher
+
+    @property
+    def keys(self) -> MerchantKeys:
+        return self._ruleset.keys
+
+    @property
+    def fuzzy(self):
+        return self._ruleset.fuzzy
+
+    def _load(self, mtime):
+        rules, default, version = load_rules(self.path)
+        ruleset = RuleSet(
+            version, rules, default, KeywordMatcher(rules, default), MerchantKeys(rules),
+            None if self.fuzzy_threshold is None else MerchantIndex(rules, self.fuzzy_threshold),
+        )
+        self._history[version] = (rules, default)
+        self._history.move_to_end(version)
+        while len(self._history) > _MAX_HISTORY:
+            self._history.popitem(last=False)
+        self._ruleset = ruleset
+        self.mtime = mtime
+        with self._memo_lock:
+            self._memo.clear()
+
+    def maybe_reload(self) -> bool:
+        """Recarga las reglas si el archivo cambió. Regresa True si hay versión nueva."""
+        with self._reload_lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                self.last_error = e
+                return False
+            if mtime == self.mtime:
+                return False
+            previous = self.version
+            try:
+                self._load(mtime)
+            except (OSError, ValueError) as e:
+                # No reintentar en cada rerun hasta que el archivo vuelva a cambiar.
+                self.mtime = mtime
+                self.last_error = e
+                return False
+            self.last_error = None
+            return self.version != previous
+
+    def _match_many(self, descripciones, ruleset: RuleSet = None):
+        ruleset = ruleset or self._ruleset
+        version = ruleset.version
+        memo = self._memo
+        results = [None] * len(descripciones)
+        missing = []
+        with self._memo_lock:
+            for i, desc in enumerate(descripciones):
+                result = memo.get((version, desc))
+                if result is None:
+                    missing.append(i)
+                else:
+                    memo.move_to_end((version, desc))
+                    results[i] = result
+            self.memo_hits += len(descripciones) - len(missing)
+        if not missing:
+            return results
+        keys = [ruleset.keys.key(descripciones[i]) for i in missing]
+        with self._memo_lock:
+            known = [memo.get((version, key)) for key in keys]
+        new = {}
+        for i, key, result in zip(missing, keys, known):
+            if result is None:
+                result = new.get(key) or ruleset.match_key(key)
+                new[key] = result
+            results[i] = result
+        with self._memo_lock:
+            self.memo_misses += len(new)
+            # Si las reglas cambiaron mientras tanto, no llenar el LRU con la versión vieja.
+            if ruleset is self._ruleset:
+                for i, key in zip(missing, keys):
+                    memo[(version, key)] = results[i]
+                    memo.move_to_end((version, key))
+                    memo[(version, descripciones[i])] = results[i]
+                while len(memo) > self.memo_size:
+                    memo.popitem(last=False)
+        return results
+
+    def match(self, descripcion: str) -> str:
+        return self._match_many([descripcion])[0][0]
+
+    def match_series(self, descripciones: pd.Series, ruleset: RuleSet = None) -> pd.Series:
+        """Categoriza una Serie evaluando cada descripción distinta una sola vez."""
+        uniques = pd.unique(descripciones.to_numpy())
+        return descripciones.map(dict(zip(uniques, (r[0] for r in self._match_many(uniques, ruleset)))))
+
+    def match_details(self, descripciones: pd.Series) -> pd.DataFrame:
+        """Categoría, palabra clave de la coincidencia aproximada (o None) y confianza de cada descripción distinta."""
+        uniques = pd.unique(descripciones.to_numpy())
+        results = self._match_many(uniques)
+        return pd.DataFrame({
+            "Descripción": uniques,
+            "Categoría": [r[0] for r in results],
+            "Comercio": [r[1] for r in results],
+            "Confianza": [r[2] for r in results],
+        })
+
+    def _has_own_keyword(self, ruleset, descripciones: pd.Series, categorias: pd.Series, keywords_by_category) -> pd.Series:
+        pairs = pd.unique(pd.Series(list(zip(descripciones, categorias)), dtype=object).to_numpy())
+        exact = {}
+        for desc, category in pairs:
+            key = ruleset.keys.key(desc)
+            exact[(desc, category)] = any(keyword in key for keyword in keywords_by_category.get(category, ()))
+        return pd.Series([exact[pair] for pair in zip(descripciones, categorias)], index=categorias.index)
+
+    def recategorize(self, descripciones: pd.Series, categorias: pd.Series, from_version: str,
+                     ruleset: RuleSet = None):
+        """
+        Actualiza categorías calculadas con la versión `from_version` de las reglas
+        a la de `ruleset` (por defecto la vigente).
+
+        Regresa (categorias_nuevas, filas_cambiadas). Si la versión anterior ya no
+        está en el historial se reevalúan todas las filas.
+        """
+        ruleset = ruleset or self._ruleset
+        if from_version == ruleset.version:
+            return categorias, 0
+        previous = self._history.get(from_version)
+        if previous is None:
+            candidates = pd.Series(True, index=categorias.index)
+        else:
+            old_rules, old_default = previous
+            first = first_changed_rule(old_rules, old_default, ruleset.rules, ruleset.default)
+            if first is None:
+                return categorias, 0
+            old_priority = {category: i for i, (category, _) in enumerate(old_rules)}
+            # Categorías que no estaban en la tabla (p. ej. el default) cuentan como la última.
+            priority = categorias.map(old_priority).fillna(len(old_rules))
+            candidates = priority >= first
+            if ruleset.fuzzy is not None:
+                # Una coincidencia aproximada depende de todas las palabras clave: también se
+                # reevalúan las filas sin ninguna palabra clave de su propia regla.
+                candidates |= ~self._has_own_keyword(ruleset, descripciones, categorias, dict(old_rules))
+        if not candidates.any():
+            return categorias, 0
+        nuevas = self.match_series(descripciones[candidates], ruleset)
+        changed = nuevas != categorias[candidates]
+        result = categorias.copy()
+        result.loc[changed[changed].index] = nuevas[changed]
+        return result, int(changed.sum())
+
+
+ENGINE = RuleEngine()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Modo por lotes, sin navegador:
+
+    python -m gastos estados/ "2024/**/*.pdf" -o gastos.xlsx --workers 8
+
+Lee todos los PDFs indicados (directorios, globs o archivos), los procesa en
+paralelo, escribe la tabla unificada (con la columna Recurrente) en Excel,
+CSV o Parquet según la extensión de salida y reporta el rendimiento
+(archivos/s, páginas/s, filas/s). El Excel incluye la hoja Recurrentes con
+el próximo cargo proyectado de cada suscripción o servicio.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from gastos.categorias import ENGINE
+from gastos.extraccion import default_workers, extract_many
+from gastos.exportar import write_excel
+from gastos.lectores import BACKENDS, resolve_backend
+from gastos.pipeline import build_transactions, display_frame, summarize
+from gastos.recurrentes import detect_recurring
+
+FORMATS = (".xlsx", ".csv", ".csv.gz", ".parquet")
+
+
+def collect_paths(inputs):
+    """PDFs de cada entrada, sin repetir y en orden estable."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True)
+            found += glob.glob(os.path.join(item, "**", "*.PDF"), recursive=True)
+        elif glob.has_magic(item):
+            found = glob.glob(item, recursive=True)
+        else:
+            found = [item]
+        paths.extend(sorted(found))
+    return list(dict.fromkeys(paths))
+
+
+def output_format(path: str) -> str:
+    for ext in sorted(FORMATS, key=len, reverse=True):
+        if path.lower().endswith(ext):
+            return ext
+    raise ValueError(f"Formato de salida no soportado: {path} (usa {', '.join(FORMATS)})")
+
+
+def write_output(path, df_gastos, recurrentes=None):
+    fmt = output_format(path)
+    if fmt == ".xlsx":
+        _, resumen_cat, pivot = summarize(df_gastos)
+        write_excel(path, df_gastos, resumen_cat, pivot, recurrentes=recurrentes)
+    elif fmt == ".parquet":
+        display_frame(df_gastos).to_parquet(path, index=False)
+    else:
+        display_frame(df_gastos).to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gastos", description="Clasifica estados de cuenta en PDF por lotes.")
+    parser.add_argument("inputs", nargs="+", help="Directorios, globs o archivos PDF")
+    parser.add_argument("-o", "--output", required=True, help="Archivo de salida (.xlsx, .csv, .csv.gz o .parquet)")
+    parser.add_argument("-w", "--workers", type=int, default=default_workers(), help="Procesos en paralelo (default: %(default)s)")
+    parser.add_argument("--pages-per-task", type=int, default=25, help="Páginas por tarea al dividir PDFs largos (0 = no dividir)")
+    parser.add_argument("--vectorizado", action="store_true", help="Usar el parser por lotes (pandas/Arrow) en lugar del parser por líneas en archivos sin emisor reconocido")
+    parser.add_argument("--tablas", action="store_true", help="Leer las transacciones por columnas (posición de las palabras)")
+    parser.add_argument("--lector", default="auto", help="Lector de PDF: auto, " + ", ".join(BACKENDS) + " (default: %(default)s)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar el lector usado en cada archivo y las categorías por coincidencia aproximada")
+    args = parser.parse_args(argv)
+
+    try:
+        output_format(args.output)
+        resolve_backend(args.lector)
+    except ValueError as e:
+        parser.error(str(e))
+    paths = collect_paths(args.inputs)
+    if not paths:
+        print("No se encontraron PDFs.", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    results = extract_many([(path, path) for path in paths], workers=args.workers, pages_per_task=args.pages_per_task,
+                           vectorized=args.vectorizado, backend=args.lector, tables=args.tablas)
+    for result in results:
+        if result.error is not None:
+            print(f"Error al leer el PDF {result.name}: {result.error}", file=sys.stderr)
+        elif args.verbose:
+            print(f"{result.name}: {result.pages} páginas, {len(result.df)} filas, lector {result.backend}, "
+                  f"emisor {result.issuer or 'genérico'}", file=sys.stderr)
+
+    df_gastos = build_transactions([(r.name, r.df) for r in results if r.error is None])
+    if df_gastos is None:
+        print("No se encontraron transacciones.", file=sys.stderr)
+        return 1
+    recurrente, proximos = detect_recurring(df_gastos)
+    df_gastos = df_gastos.assign(Recurrente=recurrente)
+    write_output(args.output, df_gastos, proximos)
+    if args.verbose:
+        aproximadas = ENGINE.match_details(df_gastos["Descripción"]).dropna(subset=["Comercio"])
+        for r in aproximadas.itertuples(index=False):
+            print(f"~ {r.Descripción} -> {r.Categoría} ({r.Comercio}, confianza {r.Confianza:.2f})", file=sys.stderr)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    n_files = len(results)
+    n_pages = sum(r.pages for r in results)
+    n_rows = len(df_gastos)
+    n_errors = sum(r.error is not None for r in results)
+    print(
+        f"{n_files} archivos ({n_errors} con error), {n_pages} páginas, {n_rows} filas en {elapsed:.2f} s: "
+        f"{n_files / elapsed:.1f} archivos/s, {n_pages / elapsed:.1f} páginas/s, {n_rows / elapsed:.0f} filas/s "
+        f"-> {args.output}"
+    )
+    return 0
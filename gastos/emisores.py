@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Detección del emisor y parsers de línea por banco.
+
+`detect_issuer` revisa el texto de las primeras páginas una sola vez por
+archivo y regresa el parser del banco (el de más renglones reconocidos entre
+los que se mencionan). Cada parser tiene una sola regex
+anclada al inicio de la línea, así que las líneas que no empiezan con fecha
+se descartan en el primer carácter en lugar de pasar por la búsqueda
+genérica de monto y fecha. Si el emisor no se reconoce, o su regex rechaza
+una línea que empieza con fecha, se usa `extraccion.match_line`.
+
+Para agregar un banco: subclase de `IssuerParser` con `name`, `markers` y
+`LINE_PAT` (grupos d, m, y opcional, desc, amt y cr), registrada con
+`@register_issuer`.
+"""
+import re
+
+from gastos.extraccion import CREDIT_WORDS, MESES_MAP, match_line
+
+# Monto con o sin centavos y signo opcional: 1,234.56 / $ 89.00 / (1,234.56) / 1.234,56
+# / -1,234.56 / - 300.00 / 1,250
+_AMOUNT = r"(?P<amt>[+-]?\s*\(?\$?\s?\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?\)?)"
+_EURO_PAT = re.compile(r"\d\.\d{3},\d{2}$|^\d{1,3},\d{2}$")
+
+
+def parse_amount(raw: str):
+    """
+    Monto (formato MX o europeo); negativo si va entre paréntesis o con "-".
+    A diferencia de extraccion.parse_amount, "123,45" se lee como 123.45.
+    Regresa None si el texto no es un monto ("1.234.567"), igual que aquélla.
+    """
+    s = "".join(raw.split())
+    sign = s[0] if s[:1] in "+-" else ""
+    s = s[len(sign):]
+    neg = s.startswith("(") or sign == "-"
+    s = s.strip("()").replace("$", "")
+    if _EURO_PAT.search(s):
+        s = s.replace(".", "").replace(",", ".")
+    else:
+        s = s.replace(",", "")
+    try:
+        val = float(s)
+    except ValueError:
+        return None
+    return -val if neg else val
+
+
+class IssuerParser:
+    """Parser de líneas de un emisor."""
+    name = None
+    markers = ()
+    LINE_PAT = None
+
+    def detect(self, text_lower: str) -> bool:
+        return any(marker in text_lower for marker in self.markers)
+
+    def match_line(self, line: str):
+        """(día, mes, año o None, descripción, monto) o None, como extraccion.match_line."""
+        m = self.LINE_PAT.match(line)
+        if m is None:
+            return None
+        month = m.group("m")
+        month = int(month) if month.isdigit() else MESES_MAP.get(month[:3].lower())
+        if not month:
+            return None
+        year = m.group("y")
+        if year:
+            year = int(year) + 2000 if len(year) == 2 else int(year)
+        amount = parse_amount(m.group("amt"))
+        if amount is None:
+            return None
+        desc = " ".join(m.group("desc").split())
+        if m.group("cr") or any(w in line.lower() for w in CREDIT_WORDS):
+            amount = -abs(amount)
+        return int(m.group("d")), month, year or None, self.description(desc, m), amount
+
+    def description(self, desc: str, match) -> str:
+        return desc.strip(" -–—|")
+
+
+ISSUERS = []
+
+
+def register_issuer(cls):
+    """Registra un parser; el orden de registro es el orden de detección."""
+    ISSUERS.append(cls())
+    return cls
+
+
+@register_issuer
+class AmexParser(IssuerParser):
+    """AMEX: "15 ENE UBER EATS 234.00 [CR]", con RFC/REF unidos después del monto."""
+    name = "amex"
+    markers = ("american express", "amex")
+    LINE_PAT = re.compile(
+        r"\s*(?P<d>\d{1,2})\s+(?P<m>[A-Za-z]{3})[a-z]*\.?(?:\s+(?P<y>\d{4}))?\s+(?P<desc>.+?)\s+" + _AMOUNT
+        + r"(?:\s*(?P<cr>CR))?\s*(?P<suffix>\|\s*(?:RFC|REF).*)?$", re.IGNORECASE)
+
+    def description(self, desc, match):
+        desc = desc.strip(" -–—|")
+        suffix = match.group("suffix")
+        return desc + " " + " ".join(suffix.split()) if suffix else desc
+
+
+@register_issuer
+class BbvaParser(IssuerParser):
+    """BBVA: "12/ENE/2024 OXXO 1,234.56" o "12-01-24 OXXO 1,234.56"."""
+    name = "bbva"
+    markers = ("bbva",)
+    LINE_PAT = re.compile(
+        r"\s*(?P<d>\d{1,2})[/\-.](?P<m>[A-Za-z]{3}|\d{1,2})(?:[/\-.](?P<y>\d{4}|\d{2}))?\s+(?P<desc>.+?)\s+" + _AMOUNT
+        + r"(?:\s*(?P<cr>CR))?\s*$", re.IGNORECASE)
+
+
+def detect_issuer(text: str):
+    """
+    Parser del emisor de `text` (las primeras páginas), o None (formato genérico).
+
+    Un marcador puede aparecer en el estado de otro banco ("PAGO TARJETA AMEX"
+    en uno de BBVA), así que entre los emisores cuyo marcador aparece gana el
+    que reconoce más renglones y, si empatan, el que más se menciona. Si
+    ninguno reconoce un renglón pero match_line sí encuentra transacciones, el
+    formato no es el de ningún emisor y se regresa None.
+    """
+    lower = text.lower()
+    candidates = [parser for parser in ISSUERS if parser.detect(lower)]
+    if not candidates:
+        return None
+    lines = text.splitlines()
+
+    def score(parser):
+        return (sum(parser.LINE_PAT.match(line) is not None for line in lines),
+                sum(lower.count(marker) for marker in parser.markers))
+
+    scores = {parser.name: score(parser) for parser in candidates}
+    best = max(candidates, key=lambda parser: scores[parser.name])  # en empate, el primero registrado
+    if scores[best.name][0] == 0 and any(match_line(line) is not None for line in lines):
+        return None
+    return best
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación de resultados.
+
+El Excel se escribe directamente con xlsxwriter, fila por fila, en modo
+`constant_memory` cuando la hoja de transacciones es grande: xlsxwriter sólo
+guarda la fila actual y vuelca el resto a un archivo temporal. Para
+historiales de 100k filas también hay formatos compactos (CSV.gz, Parquet).
+
+`ExportCache` guarda el último archivo generado por huella de los datos, así
+que la descarga sólo se construye cuando se pide y una sola vez por versión
+de los datos. Lo que guarda está acotado en número de archivos y en bytes.
+"""
+import gzip
+import hashlib
+import io
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from gastos.pipeline import display_frame, format_months
+
+# A partir de cuántas transacciones se usa el modo de memoria constante.
+CONSTANT_MEMORY_ROWS = 20000
+
+FORMATS = {
+    "xlsx": ("gastos_resumen.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv.gz": ("gastos_transacciones.csv.gz", "application/gzip"),
+    "parquet": ("gastos_transacciones.parquet", "application/vnd.apache.parquet"),
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def data_fingerprint(*frames) -> str:
+    """Huella de contenido (valores, índice y columnas) de uno o más DataFrames."""
+    h = hashlib.sha256()
+    for df in frames:
+        df = format_months(df)
+        h.update(repr((list(df.columns), df.shape)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _cell(value):
+    """Valor escribible por xlsxwriter (None para faltantes)."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Period):
+        return value.strftime("%Y-%m")
+    return value
+
+
+def _write_sheet(workbook, name, df, index, header_fmt, date_fmt):
+    sheet = workbook.add_worksheet(name)
+    columns = ([df.index.name or ""] if index else []) + [str(c) for c in df.columns]
+    sheet.write_row(0, 0, columns, header_fmt)
+    date_cols = {i for i, col in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df[col])}
+    offset = 1 if index else 0
+    for r, row in enumerate(df.itertuples(index=index, name=None), start=1):
+        for c, value in enumerate(row):
+            value = _cell(value)
+            if value is None:
+                continue
+            if (c - offset) in date_cols:
+                sheet.write_datetime(r, c, value.to_pydatetime(), date_fmt)
+            else:
+                sheet.write(r, c, value)
+
+
+def write_excel(target, df_gastos, resumen_cat, pivot, constant_memory: bool = None, recurrentes=None):
+    """
+    Escribe las hojas Transacciones, Por Categoría y Mes-Categoría en `target`
+    (ruta o buffer), y Recurrentes si se da la tabla de próximos cargos de
+    gastos.recurrentes. Por defecto usa memoria constante si hay más de
+    CONSTANT_MEMORY_ROWS transacciones.
+    """
+    import xlsxwriter
+
+    if constant_memory is None:
+        constant_memory = len(df_gastos) > CONSTANT_MEMORY_ROWS
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": constant_memory})
+    header_fmt = workbook.add_format({"bold": True, "border": 1})
+    date_fmt = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    _write_sheet(workbook, "Transacciones", display_frame(df_gastos), False, header_fmt, date_fmt)
+    _write_sheet(workbook, "Por Categoría", resumen_cat, False, header_fmt, date_fmt)
+    _write_sheet(workbook, "Mes-Categoría", format_months(pivot), True, header_fmt, date_fmt)
+    if recurrentes is not None:
+        _write_sheet(workbook, "Recurrentes", recurrentes, False, header_fmt, date_fmt)
+    workbook.close()
+
+
+def excel_bytes(df_gastos, resumen_cat, pivot, recurrentes=None) -> bytes:
+    buf = io.BytesIO()
+    write_excel(buf, df_gastos, resumen_cat, pivot, recurrentes=recurrentes)
+    return buf.getvalue()
+
+
+def csv_gz_bytes(df_gastos) -> bytes:
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) as gz:
+        with io.TextIOWrapper(gz, encoding="utf-8", newline="") as text:
+            display_frame(df_gastos).to_csv(text, index=False)
+    return buf.getvalue()
+
+
+def parquet_bytes(df_gastos) -> bytes:
+    buf = io.BytesIO()
+    display_frame(df_gastos).to_parquet(buf, index=False)
+    return buf.getvalue()
+
+
+def build_export(fmt, df_gastos, resumen_cat, pivot, recurrentes=None) -> bytes:
+    if fmt == "xlsx":
+        return excel_bytes(df_gastos, resumen_cat, pivot, recurrentes)
+    if fmt == "csv.gz":
+        return csv_gz_bytes(df_gastos)
+    if fmt == "parquet":
+        return parquet_bytes(df_gastos)
+    raise ValueError(f"Formato de exportación desconocido: {fmt}")
+
+
+class ExportCache:
+    """
+    Últimos archivos exportados, por (formato, huella de los datos), hasta
+    `max_entries` archivos y `max_bytes` bytes (sin límite con None). Un
+    archivo más grande que `max_bytes` se regresa pero no se guarda.
+    """
+
+    def __init__(self, max_entries: int = 2, max_bytes: int = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        # get() corre en el hilo de la descarga.
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, fmt, df_gastos, resumen_cat, pivot, recurrentes=None) -> bytes:
+        frames = [df_gastos, resumen_cat, pivot] + ([] if recurrentes is None else [recurrentes])
+        key = (fmt, data_fingerprint(*frames))
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        data = build_export(fmt, df_gastos, resumen_cat, pivot, recurrentes)
+        with self._lock:
+            if key not in self._entries and (self.max_bytes is None or len(data) <= self.max_bytes):
+                self._entries[key] = data
+                self._total_bytes += len(data)
+                while len(self._entries) > self.max_entries or (
+                        self.max_bytes is not None and self._total_bytes > self.max_bytes):
+                    _, old = self._entries.popitem(last=False)
+                    self._total_bytes -= len(old)
+        return data
@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción de transacciones de estados de cuenta en PDF (BBVA, AMEX).
+
+El parser es un pipeline de generadores (páginas -> líneas -> unión RFC/REF
+-> regex -> registros), así que la memoria queda acotada por una página y las
+transacciones pueden mostrarse conforme se leen.
+
+`extract_many` reparte los archivos (y, si son largos, rangos de páginas)
+en un ProcessPoolExecutor; `iter_extract_many` hace lo mismo avisando el
+avance de cada archivo. Las páginas de cada archivo se reensamblan en el
+orden original antes de interpretarlas, así que el resultado es idéntico al
+modo serial; un PDF dañado sólo afecta a su propio FileResult.
+
+El texto de las páginas sale del lector más rápido disponible (gastos.lectores);
+las páginas en que no se reconoce ninguna transacción se releen con pdfplumber.
+Qué lector se usó queda en `ExtractionInfo` / FileResult.backend.
+
+Las líneas se interpretan con el parser del emisor detectado en las primeras
+páginas (gastos.emisores) o, si no se reconoce, con `match_line`; las
+líneas con fecha que el parser del emisor rechaza también pasan por `match_line`.
+"""
+import os
+import re
+from collections import Counter
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain, islice
+
+import pandas as pd
+
+from gastos.lectores import max_resident_pages, open_reader, pdf_source, resolve_backend
+
+# Cambiar cuando se modifique el parser: invalida las entradas del caché.
+PARSER_VERSION = "6.9"
+
+
+YEAR_PAT = re.compile(r"(20\d{2})")
+
+MESES_MAP = {
+    "ene": 1, "enero": 1, "feb": 2, "febrero": 2, "mar": 3, "marzo": 3,
+    "abr": 4, "abril": 4, "may": 5, "mayo": 5, "jun": 6, "junio": 6,
+    "jul": 7, "julio": 7, "ago": 8, "agosto": 8, "sep": 9, "sept": 9,
+    "set": 9, "oct": 10, "octubre": 10, "nov": 11, "noviembre": 11,
+    "dic": 12, "diciembre": 12,
+}
+
+_DATE_RE = r"\b(?P<d>\d{1,2})[/\s\.\-](?:de)?\s*(?P<m>(?:ene|feb|mar|abr|may|jun|jul|ago|sep|set|oct|nov|dic)[a-z]*|\d{1,2})[/\s\.\-]*(?P<y>\d{2,4})?\b"
+_AMOUNT_RE = r"(?P<amt>[+-]?\s*\$?\s*\(?\s*\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?\s*\)?)\s*(?P<cr>CR)?\s*$"
+DATE_PAT = re.compile(_DATE_RE, re.IGNORECASE)
+AMOUNT_PAT = re.compile(_AMOUNT_RE, re.IGNORECASE)
+# Línea completa en una sola pasada: texto antes de la fecha, fecha, texto
+# hasta el monto, monto y CR. Los `.*?` perezosos dan la primera fecha y el
+# primer inicio del monto después de la fecha. La fecha va dentro de un
+# lookahead (atómico) para que no se recorte al buscar el monto. Si la primera
+# fecha se traslapa con el monto ("Página 1 de 24", "15 ENE 12,345.67"), el
+# monto que encuentra el patrón es sólo la cola del número; match_line lo
+# detecta y descarta la línea (ver _overlaps_amount).
+TRANSACTION_PAT = re.compile(
+    r"^(?P<lead>.*?)(?=(?P<fecha>" + _DATE_RE + r"))(?P=fecha)(?P<desc>.*?)" + _AMOUNT_RE, re.IGNORECASE
+)
+EURO_PAT = re.compile(r"\d+\.\d{3},\d{2}$")
+SPACES_PAT = re.compile(r"\s{2,}")
+_AMOUNT_CHARS = frozenset("0123456789.,$()+-")
+# Palabras que marcan un abono aunque el monto no traiga "CR" ni paréntesis.
+CREDIT_WORDS = ("abono", "pago", "payment")
+
+COLUMNS = ["Fecha", "Descripción", "Monto"]
+
+# Páginas iniciales donde se busca el año (periodo del estado de cuenta).
+YEAR_HINT_PAGES = 2
+
+
+def detect_year(text: str):
+    """Busca un año de 4 dígitos razonable (2000-2099) en el PDF."""
+    years = Counter(YEAR_PAT.findall(text))
+    if years:
+        return years.most_common(1)[0][0]
+    return str(datetime.now().year)
+
+def parse_amount(raw: str):
+    """Convierte importes con formatos MX: separador miles , y decimal . o viceversa."""
+    s = raw.strip()
+    neg = False
+    if s.startswith("(") and s.endswith(")"):
+        neg = True
+        s = s[1:-1]
+    s = s.replace("$", "").replace(" ", "")
+    if EURO_PAT.search(s):
+        s = s.replace(".", "").replace(",", ".")
+    else:
+        s = s.replace(",", "")
+    try:
+        val = float(s)
+        return -val if neg else val
+    except:
+        return None
+
+@dataclass
+class ExtractionInfo:
+    """Lector usado para un archivo y cuántas páginas se releyeron con pdfplumber."""
+    backend: str = None
+    pages: int = 0
+    fallback_pages: int = 0
+    issuer: str = None
+
+    def label(self) -> str:
+        if self.fallback_pages:
+            return f"{self.backend} (+pdfplumber en {self.fallback_pages} de {self.pages} págs.)"
+        return self.backend
+
+def page_has_transactions(text: str) -> bool:
+    """
+    Verificación barata del texto de un lector rápido: alguna línea tiene una
+    fecha y termina en un monto. No interpreta la transacción completa.
+    """
+    return any(_may_end_in_amount(line) and AMOUNT_PAT.search(line) and DATE_PAT.search(line)
+               for line in text.splitlines())
+
+def _needs_fallback(text: str) -> bool:
+    """
+    Una página sin transacciones se relee con pdfplumber, salvo que no tenga
+    ningún dígito (vacía, portada, texto legal): ahí tampoco habría montos.
+    """
+    return any(c.isdigit() for c in text) and not page_has_transactions(text)
+
+def iter_page_texts(file, backend: str = None, info: ExtractionInfo = None, start: int = 0, stop: int = None):
+    """
+    Texto de cada página (de `start` a `stop`), una a la vez, con el lector
+    `backend` (por defecto el más rápido disponible). Si un lector distinto de
+    pdfplumber no produce ninguna línea con fecha y monto en una página que
+    sí tiene dígitos, esa página se relee con pdfplumber. `info` registra el
+    lector y las páginas releídas.
+    """
+    source = pdf_source(file)
+    name = resolve_backend(backend)
+    if info is None:
+        info = ExtractionInfo()
+    info.backend = name
+    fallback = None
+    with open_reader(name, source) as reader:
+        try:
+            for i in range(start, len(reader) if stop is None else min(stop, len(reader))):
+                text = reader.page_text(i)
+                info.pages += 1
+                if name != "pdfplumber" and _needs_fallback(text):
+                    if fallback is None:
+                        fallback = open_reader("pdfplumber", source)
+                    text = fallback.page_text(i)
+                    info.fallback_pages += 1
+                yield text
+        finally:
+            if fallback is not None:
+                fallback.close()
+
+def extract_pdf_text(file):
+    """Texto plano de todas las páginas del PDF."""
+    return "".join(text + "\n" for text in iter_page_texts(file))
+
+def iter_lines(page_texts):
+    """Líneas de cada página, en el mismo corte que splitlines() sobre el texto completo."""
+    for text in page_texts:
+        yield from (text + "\n").splitlines()
+
+def merge_continuations(lines):
+    """Une a la línea anterior las líneas que empiezan con RFC/REF (descripciones de AMEX)."""
+    previous = None
+    for line in lines:
+        line_lower = line.lower().strip()
+        if (line_lower.startswith("rfc") or line_lower.startswith("ref")) and previous is not None:
+            previous += " | " + line.strip()
+            continue
+        if previous is not None:
+            yield previous
+        previous = line
+    if previous is not None:
+        yield previous
+
+def _may_end_in_amount(line: str) -> bool:
+    """
+    Filtro previo barato: AMOUNT_PAT sólo coincide si la línea termina (sin
+    espacios) en dígito, ")" o "CR". Descarta encabezados y texto legal sin
+    correr ninguna expresión regular.
+    """
+    tail = line.rstrip()[-2:]
+    return bool(tail) and (tail[-1].isdigit() or tail[-1] == ")" or tail.lower() == "cr")
+
+def _overlaps_amount(line_clean: str, match) -> bool:
+    """
+    True si el primer monto de la línea (AMOUNT_PAT.search) empieza dentro de
+    la fecha. Sólo puede pasar si entre la fecha y el monto encontrado no hay
+    más que caracteres de monto, así que la búsqueda extra casi nunca corre.
+    """
+    if not all(ch in _AMOUNT_CHARS or ch.isspace() for ch in match.group("desc")):
+        return False
+    return AMOUNT_PAT.search(line_clean).start() < match.end("fecha")
+
+def match_line(line: str):
+    """
+    Interpreta una línea: regresa (día, mes, año o None, descripción, monto)
+    o None si no parece transacción. El año None se resuelve con la pista del PDF.
+    """
+    if not _may_end_in_amount(line):
+        return None
+    line_clean = SPACES_PAT.sub(" ", line).strip()
+    match = TRANSACTION_PAT.match(line_clean)
+    if not match or _overlaps_amount(line_clean, match):
+        return None
+    amount = parse_amount(match.group("amt"))
+    if amount is None:
+        return None
+    if match.group("cr") or any(w in line_clean.lower() for w in CREDIT_WORDS):
+        amount = -abs(amount)
+    parts = date_parts(match)
+    if parts is None:
+        return None
+    desc_part = (match.group("lead") + match.group("desc")).strip(" -–—|")
+    return (*parts, desc_part, amount)
+
+def date_parts(date_match):
+    """(día, mes, año o None) de un match de DATE_PAT, o None si el mes no es válido."""
+    try:
+        day = int(date_match.group('d'))
+        month_str = date_match.group('m').lower()
+        month = int(month_str) if month_str.isdigit() else MESES_MAP.get(month_str[:3])
+        if not month:
+            return None
+        year_str = date_match.group('y')
+        if year_str and len(year_str) == 2:
+            year = int(year_str) + 2000
+        elif year_str:
+            year = int(year_str)
+        else:
+            year = None
+    except (ValueError, TypeError):
+        return None
+    return day, month, year
+
+def _to_record(match, year_hint: int):
+    day, month, year, desc_part, amount = match
+    year = year if year is not None else year_hint
+    # Años de 3 dígitos ("12/01/202") son texto cortado, no fechas reales.
+    if year < 1000:
+        return None
+    try:
+        fecha = datetime(year, month, day)
+    except (ValueError, TypeError):
+        return None
+    return [fecha, desc_part, amount]
+
+def detect_parser(head_text: str):
+    """Parser del emisor reconocido en el texto de las primeras páginas, o None."""
+    from gastos.emisores import detect_issuer
+    return detect_issuer(head_text)
+
+def _issuer_fallback(line: str):
+    """Línea rechazada por el parser del emisor: si empieza con fecha y puede terminar en monto, match_line."""
+    if _may_end_in_amount(line) and DATE_PAT.match(line.lstrip()):
+        return match_line(line)
+    return None
+
+def iter_matches(lines, parser=None):
+    """
+    Coincidencias de cada línea con el parser del emisor. Las líneas que su
+    regex rechaza pero empiezan con fecha y pueden terminar en monto (signo
+    "-1,234.56", monto sin centavos) se interpretan con el parser genérico en
+    lugar de perderse. Si el formato no es el del emisor, detect_issuer ya lo
+    descartó con las primeras páginas, así que las líneas salen una a una.
+    """
+    for line in lines:
+        if parser is None:
+            match = match_line(line)
+        else:
+            match = parser.match_line(line)
+            if match is None:
+                match = _issuer_fallback(line)
+        if match is not None:
+            yield match
+
+def iter_transactions(page_texts, year_pages: int = YEAR_HINT_PAGES, info: ExtractionInfo = None):
+    """
+    Pipeline por páginas: páginas -> líneas -> unión RFC/REF -> regex -> registros.
+
+    El año por defecto se toma de las primeras `year_pages` páginas, así que los
+    registros salen mientras se leen las páginas siguientes. Si ahí no aparece
+    ningún año, se cuentan los años de todo el documento y los registros se
+    emiten al final (mismo resultado que detect_year sobre el texto completo).
+    En esas mismas páginas se detecta el emisor; `info.issuer` lo registra.
+    """
+    pages = iter(page_texts)
+    head = list(islice(pages, year_pages))
+    head_text = "\n".join(head)
+    parser = detect_parser(head_text)
+    if info is not None:
+        info.issuer = parser.name if parser is not None else None
+    head_years = Counter(YEAR_PAT.findall(head_text))
+    if head_years:
+        year_hint = int(head_years.most_common(1)[0][0])
+        for match in iter_matches(merge_continuations(iter_lines(chain(head, pages))), parser):
+            record = _to_record(match, year_hint)
+            if record is not None:
+                yield record
+        return
+
+    years = Counter()
+    def counted(texts):
+        for text in texts:
+            years.update(YEAR_PAT.findall(text))
+            yield text
+    matches = list(iter_matches(merge_continuations(iter_lines(chain(head, counted(pages)))), parser))
+    year_hint = int(years.most_common(1)[0][0]) if years else datetime.now().year
+    for match in matches:
+        record = _to_record(match, year_hint)
+        if record is not None:
+            yield record
+
+def iter_transaction_batches(file, year_pages: int = YEAR_HINT_PAGES, backend: str = None, info: ExtractionInfo = None):
+    """DataFrames parciales (aprox. uno por página) para mostrar avance mientras se lee el PDF."""
+    pages_read = 0
+    def counted(texts):
+        nonlocal pages_read
+        for text in texts:
+            pages_read += 1
+            yield text
+    batch = []
+    seen = 0
+    for record in iter_transactions(counted(iter_page_texts(file, backend, info)), year_pages, info):
+        if pages_read != seen and batch:
+            yield transactions_frame(batch)
+            batch = []
+        seen = pages_read
+        batch.append(record)
+    if batch:
+        yield transactions_frame(batch)
+
+def transactions_frame(records):
+    """DataFrame de registros (fecha, descripción, monto) con Fecha como datetime64."""
+    df = pd.DataFrame(list(records), columns=COLUMNS)
+    df["Fecha"] = df["Fecha"].astype("datetime64[ns]")
+    return df
+
+def extract_transactions_from_pdf(file, backend: str = None):
+    """
+    Extrae transacciones de un PDF (diseñado para BBVA y AMEX).
+    Los errores de lectura se propagan al llamador. El lector usado queda en
+    `df.attrs["backend"]`.
+    """
+    info = ExtractionInfo()
+    df = transactions_frame(iter_transactions(iter_page_texts(file, backend, info), info=info))
+    df.attrs["backend"] = info.label()
+    df.attrs["emisor"] = info.issuer
+    return df
+
+
+def default_workers() -> int:
+    """
+    Número de procesos: GASTOS_WORKERS o el número de CPUs (máximo 8), sin
+    pasar de las páginas que caben en el presupuesto de memoria (cada proceso
+    tiene una página abierta a la vez).
+    """
+    env = os.environ.get("GASTOS_WORKERS")
+    if env:
+        return max(1, int(env))
+    return max(1, min(8, os.cpu_count() or 1, max_resident_pages()))
+
+
+@dataclass
+class FileResult:
+    """Resultado de un archivo: DataFrame de transacciones o el error que lo impidió."""
+    name: str
+    df: pd.DataFrame = None
+    error: str = None
+    pages: int = 0
+    backend: str = None
+    issuer: str = None
+
+
+def count_pages(source, backend: str = None) -> int:
+    with open_reader(resolve_backend(backend), pdf_source(source)) as reader:
+        return len(reader)
+
+
+def _extract_text_range(source, start: int, stop: int, backend: str = None):
+    """(texto de cada página en [start, stop), ExtractionInfo)."""
+    info = ExtractionInfo()
+    return list(iter_page_texts(source, backend, info, start, stop)), info
+
+
+def _parse_pages(page_texts, vectorized: bool, info: ExtractionInfo = None):
+    if vectorized:
+        # El parser por lotes es genérico: sólo se usa si no se reconoce el emisor,
+        # para que --vectorizado dé los mismos montos que el parser por líneas.
+        pages = iter(page_texts)
+        head = list(islice(pages, YEAR_HINT_PAGES))
+        page_texts = chain(head, pages)
+        if detect_parser("\n".join(head)) is None:
+            from gastos.vectorizado import parse_pages_vectorized
+            return parse_pages_vectorized(page_texts)
+    return transactions_frame(iter_transactions(page_texts, info=info))
+
+
+def _extract_file(source, vectorized: bool = False, backend: str = None, tables: bool = False):
+    """(DataFrame, ExtractionInfo) de un archivo completo."""
+    info = ExtractionInfo()
+    if tables:
+        from gastos.tablas import extract_transactions_tables
+        return extract_transactions_tables(source, info=info, backend=backend), info
+    df = _parse_pages(iter_page_texts(source, backend, info), vectorized, info)
+    df.attrs["backend"] = info.label()
+    df.attrs["emisor"] = info.issuer
+    return df, info
+
+
+def _plan(source, pages_per_task, backend: str = None):
+    """Rangos de páginas en que se reparte un archivo, o None para procesarlo entero."""
+    if not pages_per_task:
+        return None
+    n_pages = count_pages(source, backend)
+    if n_pages <= pages_per_task:
+        return None
+    return [(start, min(start + pages_per_task, n_pages)) for start in range(0, n_pages, pages_per_task)]
+
+
+@dataclass
+class Progress:
+    """Avance de un archivo en iter_extract_many: `done` de `total` tareas; `result` cuando termina."""
+    index: int
+    done: int
+    total: int
+    result: FileResult = None
+
+
+def iter_extract_many(files, workers: int = None, pages_per_task: int = 25, vectorized: bool = False,
+                      backend: str = None, tables: bool = False):
+    """
+    Igual que extract_many, pero avisa el avance conforme terminan las tareas.
+
+    Genera un Progress cada vez que termina una tarea (un archivo o un rango de
+    páginas); el último Progress de cada archivo trae su FileResult. Los archivos
+    terminan en el orden en que se desocupan los procesos, no en el de `files`,
+    así que un PDF grande no retrasa a los demás.
+    """
+    files = list(files)
+    backend = resolve_backend(backend)
+    workers = default_workers() if workers is None else workers
+    results = [FileResult(name) for name, _ in files]
+    if workers <= 1 or not files:
+        for i, (result, (_, source)) in enumerate(zip(results, files)):
+            try:
+                result.df, info = _extract_file(source, vectorized, backend, tables)
+                result.pages, result.backend, result.issuer = info.pages, info.label(), info.issuer
+            except Exception as e:
+                result.error = str(e)
+            yield Progress(i, 1, 1, result)
+        return
+
+    # multiprocessing se importa sólo si de verdad hay varios procesos.
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = {}
+        parts = {}
+        whole = set()
+        for i, (_, source) in enumerate(files):
+            try:
+                ranges = None if tables else _plan(source, pages_per_task, backend)
+            except Exception as e:
+                results[i].error = str(e)
+                yield Progress(i, 0, 0, results[i])
+                continue
+            if ranges is None:
+                tasks[pool.submit(_extract_file, source, vectorized, backend, tables)] = (i, 0)
+                parts[i] = [None]
+                whole.add(i)
+            else:
+                for k, (a, b) in enumerate(ranges):
+                    tasks[pool.submit(_extract_text_range, source, a, b, backend)] = (i, k)
+                parts[i] = [None] * len(ranges)
+        for future in as_completed(tasks):
+            i, k = tasks[future]
+            result = results[i]
+            if result.error is not None:
+                continue
+            total = len(parts[i])
+            try:
+                parts[i][k] = future.result()
+            except Exception as e:
+                result.error = str(e)
+                yield Progress(i, total, total, result)
+                continue
+            done = sum(part is not None for part in parts[i])
+            if done < total:
+                yield Progress(i, done, total)
+                continue
+            try:
+                if i in whole:
+                    result.df, info = parts[i][0]
+                else:
+                    info = ExtractionInfo(backend, sum(p.pages for _, p in parts[i]),
+                                          sum(p.fallback_pages for _, p in parts[i]))
+                    result.df = _parse_pages(chain.from_iterable(texts for texts, _ in parts[i]), vectorized, info)
+                    result.df.attrs["backend"] = info.label()
+                    result.df.attrs["emisor"] = info.issuer
+                result.pages, result.backend, result.issuer = info.pages, info.label(), info.issuer
+            except Exception as e:
+                result.error = str(e)
+            del parts[i]
+            yield Progress(i, total, total, result)
+
+
+def extract_many(files, workers: int = None, pages_per_task: int = 25, vectorized: bool = False, backend: str = None,
+                 tables: bool = False):
+    """
+    Extrae transacciones de varios PDFs.
+
+    `files` es una lista de (nombre, bytes o ruta). Regresa una lista de FileResult
+    en el mismo orden. Con workers <= 1 todo corre en el proceso actual; si no, los
+    archivos con más de `pages_per_task` páginas se dividen por rangos.
+    `vectorized` usa el parser por lotes de gastos.vectorizado en los archivos
+    sin emisor reconocido (los de BBVA/AMEX siguen con su parser); `backend` elige
+    el lector de PDF (ver gastos.lectores); `tables` usa el modo por columnas de
+    gastos.tablas (los archivos no se dividen por páginas en ese modo).
+    """
+    files = list(files)
+    results = [None] * len(files)
+    for progress in iter_extract_many(files, workers, pages_per_task, vectorized, backend, tables):
+        if progress.result is not None:
+            results[progress.index] = progress.result
+    return results
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Lectores de texto de PDF intercambiables.
+
+pdfplumber calcula la geometría de cada carácter sólo para armar el texto de
+la página; pypdfium2 (si está instalado) lo obtiene directamente del motor de
+PDFium, decenas de veces más rápido. `extraccion.iter_page_texts` usa el
+lector rápido y regresa a pdfplumber en las páginas cuyo texto no pasa la
+verificación (ver `extraccion.page_has_transactions`).
+
+Para agregar otro lector basta con una clase con `__len__`, `page_text(i)`,
+`page_words(i)` y `close()` registrada con `register_backend`. Las palabras
+son diccionarios con "text", "x0", "x1" y "top" (en puntos, desde arriba),
+como las de `pdfplumber.Page.extract_words()`.
+
+pdfplumber (con pdfminer y Pillow) y pypdfium2 se importan al abrir el
+primer PDF con cada lector, no al importar este módulo: la app arranca sin
+ellos y un proceso que nunca lee PDFs no los carga.
+
+Cada lector tiene una sola página en memoria a la vez: pdfplumber libera la
+página (`page.close()`) en cuanto se extrae su texto y pdfminer no guarda los
+objetos ya leídos (en un PDF escaneado, la imagen de cada página). Así las
+páginas residentes son tantas como lectores abiertos, y `max_resident_pages`
+dice cuántos caben en el presupuesto GASTOS_MEMORIA_PDF_MB.
+"""
+import importlib.util
+import io
+import os
+
+# Presupuesto de memoria (MB) para páginas abiertas al mismo tiempo en todos los
+# procesos que leen PDFs, y estimado de una página de pdfplumber (caracteres con
+# su geometría en una página densa).
+PDF_MEMORY_MB = 512
+PAGE_MEMORY_MB = 32
+
+
+def max_resident_pages() -> int:
+    """Páginas que pueden estar abiertas a la vez: GASTOS_MEMORIA_PDF_MB / PAGE_MEMORY_MB."""
+    budget = int(os.environ.get("GASTOS_MEMORIA_PDF_MB") or PDF_MEMORY_MB)
+    return max(1, budget // PAGE_MEMORY_MB)
+
+
+def pdf_source(file):
+    """Bytes o ruta del PDF, para que cada lector lo abra por su cuenta."""
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if isinstance(file, (str, os.PathLike)):
+        return file
+    if isinstance(file, io.BytesIO):
+        return file.getvalue()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return file.read()
+
+
+class _Reader:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PdfplumberReader(_Reader):
+    name = "pdfplumber"
+
+    def __init__(self, source):
+        import pdfplumber
+
+        self._pdf = pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        # Sin esto pdfminer guarda cada objeto que lee (fuentes, contenido e imágenes
+        # de todas las páginas) hasta cerrar el documento.
+        self._pdf.doc.caching = False
+
+    def __len__(self):
+        return len(self._pdf.pages)
+
+    def page_text(self, i: int) -> str:
+        page = self._pdf.pages[i]
+        try:
+            return page.extract_text() or ""
+        finally:
+            page.close()
+
+    def page_words(self, i: int):
+        page = self._pdf.pages[i]
+        try:
+            return page.extract_words()
+        finally:
+            page.close()
+
+    def close(self):
+        self._pdf.close()
+
+
+class PdfiumReader(_Reader):
+    name = "pypdfium2"
+
+    def __init__(self, source):
+        import pypdfium2 as pdfium
+
+        self._pdf = pdfium.PdfDocument(source)
+
+    def __len__(self):
+        return len(self._pdf)
+
+    def page_text(self, i: int) -> str:
+        page = self._pdf[i]
+        textpage = page.get_textpage()
+        try:
+            text = textpage.get_text_bounded()
+        finally:
+            textpage.close()
+            page.close()
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+    def page_words(self, i: int):
+        """Palabras armadas con las cajas de cada carácter (separadas por espacios y saltos de línea)."""
+        page = self._pdf[i]
+        height = page.get_height()
+        textpage = page.get_textpage()
+        try:
+            n_chars = textpage.count_chars()
+            text = textpage.get_text_range(0, n_chars)
+            if len(text) != n_chars:
+                # Caracteres fuera del BMP: se pide el texto carácter por carácter.
+                text = [textpage.get_text_range(k, 1)[:1] or " " for k in range(n_chars)]
+            words, current = [], None
+            for k, char in enumerate(text):
+                if char.isspace():
+                    current = None
+                    continue
+                left, bottom, right, top = textpage.get_charbox(k, loose=True)
+                if current is None:
+                    current = {"text": char, "x0": left, "x1": right, "top": height - top}
+                    words.append(current)
+                else:
+                    current["text"] += char
+                    current["x1"] = max(current["x1"], right)
+            return words
+        finally:
+            textpage.close()
+            page.close()
+
+    def close(self):
+        self._pdf.close()
+
+
+BACKENDS = {"pdfplumber": PdfplumberReader}
+if importlib.util.find_spec("pypdfium2") is not None:
+    BACKENDS["pypdfium2"] = PdfiumReader
+
+# Orden de preferencia para "auto".
+_PREFERRED = ["pypdfium2", "pdfplumber"]
+
+
+def register_backend(cls):
+    """Registra un lector por su atributo `name`."""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def resolve_backend(name: str = None) -> str:
+    """Nombre del lector a usar: el indicado, GASTOS_LECTOR o "auto" (el más rápido disponible)."""
+    name = name or os.environ.get("GASTOS_LECTOR") or "auto"
+    if name == "auto":
+        return next(n for n in _PREFERRED if n in BACKENDS)
+    if name not in BACKENDS:
+        raise ValueError(f"Lector de PDF no disponible: {name} (disponibles: {', '.join(BACKENDS)})")
+    return name
+
+
+def open_reader(name: str, source):
+    return BACKENDS[name](source)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación ligera por etapa.
+
+`Medicion.stage()` mide tiempo de reloj, tiempo de CPU, filas de entrada y
+salida y, si se pidió, el pico de memoria asignada por Python (tracemalloc,
+que hace todo más lento, así que es opcional). Cada etapa se emite como una
+línea JSON en el logger "gastos.medicion".
+
+`Perfil` captura una ejecución completa con cProfile y la entrega como
+archivo .prof (pstats), que se abre con snakeviz o `python -m pstats`.
+"""
+import cProfile
+import json
+import logging
+import marshal
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+logger = logging.getLogger("gastos.medicion")
+
+
+def configure_logging(level=logging.INFO):
+    """Envía las líneas JSON de medición a stderr si nadie configuró el logger."""
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+class Etapa:
+    """Medición de una etapa; `rows_out` lo llena quien la ejecuta."""
+    __slots__ = ("stage", "archivo", "rows_in", "rows_out", "wall_s", "cpu_s", "peak_mb", "nivel", "_peak")
+
+    def __init__(self, stage, archivo=None, rows_in=None, nivel=0):
+        self.stage = stage
+        self.archivo = archivo
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_mb = None
+        self.nivel = nivel
+        self._peak = 0
+
+    def as_dict(self):
+        return {
+            "stage": self.stage, "archivo": self.archivo, "rows_in": self.rows_in, "rows_out": self.rows_out,
+            "wall_s": round(self.wall_s, 6), "cpu_s": round(self.cpu_s, 6),
+            "peak_mb": None if self.peak_mb is None else round(self.peak_mb, 3),
+        }
+
+
+class Medicion:
+    """Etapas medidas durante una ejecución (un rerun de Streamlit o una corrida del CLI)."""
+
+    def __init__(self, memoria: bool = False, run_id=None):
+        self.memoria = memoria
+        self.run_id = run_id
+        self.etapas = []
+        self._stack = []
+        self._started_tracing = False
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def stage(self, stage, archivo=None, rows_in=None):
+        etapa = Etapa(stage, archivo, rows_in, nivel=len(self._stack))
+        if self.memoria:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._stack.append(etapa)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield etapa
+        finally:
+            etapa.wall_s = time.perf_counter() - wall
+            etapa.cpu_s = time.process_time() - cpu
+            self._stack.pop()
+            if self.memoria:
+                # reset_peak() de las etapas anidadas borra el pico de ésta: se
+                # combina con el pico que reportaron las hijas.
+                peak = max(tracemalloc.get_traced_memory()[1], etapa._peak)
+                etapa.peak_mb = max(0, peak - base) / 2**20
+                if self._stack:
+                    self._stack[-1]._peak = max(self._stack[-1]._peak, peak)
+            self.etapas.append(etapa)
+            logger.info(json.dumps({"run": self.run_id, **etapa.as_dict()}, ensure_ascii=False))
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def frame(self):
+        """Tabla de etapas en el orden en que terminaron."""
+        columns = ["stage", "archivo", "rows_in", "rows_out", "wall_s", "cpu_s", "peak_mb"]
+        return pd.DataFrame([e.as_dict() for e in self.etapas], columns=columns)
+
+    def total(self):
+        """Tiempo de reloj total de las etapas de primer nivel."""
+        return sum(e.wall_s for e in self.etapas if e.nivel == 0)
+
+
+class Perfil:
+    """Captura con cProfile; `dump()` regresa el archivo .prof como bytes."""
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+        self._running = False
+
+    def start(self):
+        self._profile.enable()
+        self._running = True
+
+    def stop(self):
+        if self._running:
+            self._profile.disable()
+            self._running = False
+
+    def dump(self) -> bytes:
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Pasos del clasificador que no dependen de Streamlit: unir las transacciones
+de varios archivos, categorizarlas, resumirlas y exportarlas. Lo usan tanto
+la app como la línea de comandos (gastos.cli).
+
+La tabla unificada es columnar y compacta (ver `compact_transactions`):
+Fecha datetime64, Descripción como texto de Arrow, Centavos enteros y
+Categoría, Mes y _archivo categóricos. Sólo se convierte a texto y pesos al
+mostrarse o exportarse (display_frame / format_months).
+"""
+import pandas as pd
+
+from gastos.categorias import ENGINE
+
+CATEGORIAS_A_EXCLUIR = ["Pagos y Abonos"]
+
+try:
+    import pyarrow  # noqa: F401
+    DESCRIPTION_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    DESCRIPTION_DTYPE = pd.StringDtype("python")
+
+# Presupuesto de memoria de la tabla unificada: bytes por fila además del texto
+# (UTF-8) de la descripción. Fecha 8 + Centavos 8 + offset de Arrow 4 + códigos
+# de Categoría, Mes y _archivo (1 o 2 cada uno) = ~26. Lo verifica
+# benchmarks/memoria.py.
+BYTES_PER_ROW_BUDGET = 32
+
+COLUMNS = ["Fecha", "Descripción", "Centavos", "Categoría", "_archivo", "Mes"]
+
+
+def to_cents(montos: pd.Series) -> pd.Series:
+    return (montos * 100).round().astype("int64")
+
+
+def compact_transactions(df):
+    """
+    Tabla unificada en formato compacto a partir de columnas Fecha,
+    Descripción, Monto (pesos) o Centavos, Categoría y _archivo.
+    """
+    fecha = df["Fecha"].astype("datetime64[ns]")
+    centavos = df["Centavos"].astype("int64") if "Centavos" in df.columns else to_cents(df["Monto"])
+    return pd.DataFrame({
+        "Fecha": fecha,
+        "Descripción": df["Descripción"].astype(DESCRIPTION_DTYPE),
+        "Centavos": centavos,
+        "Categoría": df["Categoría"].astype("category"),
+        "_archivo": df["_archivo"].astype("category"),
+        "Mes": pd.Categorical(fecha.dt.to_period("M")),
+    }, index=df.index)
+
+
+def build_transactions(frames):
+    """
+    Une DataFrames de transacciones en la tabla unificada (compacta).
+
+    `frames` es una lista de (nombre_archivo, DataFrame). Si un DataFrame ya trae
+    "Categoría" se respeta; si no, se calcula con las reglas vigentes.
+    Regresa None si no hay transacciones.
+    """
+    parts = []
+    for name, df_file in frames:
+        if df_file is None or df_file.empty:
+            continue
+        if "Categoría" not in df_file.columns:
+            df_file = df_file.assign(Categoría=ENGINE.match_series(df_file["Descripción"]))
+        parts.append(df_file.assign(_archivo=name))
+    if not parts:
+        return None
+
+    df_gastos = pd.concat(parts, ignore_index=True)
+    df_gastos = df_gastos.dropna(subset=["Fecha"]).reset_index(drop=True)
+    return compact_transactions(df_gastos)
+
+
+def format_months(obj):
+    """
+    Copia para mostrar o exportar: Mes (Period[M], o categórico de Periods) como
+    texto "YYYY-MM", ya sea en la columna Mes o en el índice (pivotes). Los
+    cálculos usan el Period.
+    """
+    if isinstance(obj.index, pd.PeriodIndex):
+        obj = obj.set_axis(obj.index.strftime("%Y-%m"))
+    if isinstance(obj, pd.DataFrame) and "Mes" in obj.columns:
+        dtype = obj["Mes"].dtype
+        if isinstance(dtype, pd.PeriodDtype):
+            obj = obj.assign(Mes=obj["Mes"].dt.strftime("%Y-%m"))
+        elif isinstance(dtype, pd.CategoricalDtype) and isinstance(dtype.categories, pd.PeriodIndex):
+            obj = obj.assign(Mes=obj["Mes"].cat.rename_categories(dtype.categories.strftime("%Y-%m")))
+    return obj
+
+
+def display_frame(df_gastos):
+    """Tabla unificada para mostrar o exportar: Monto en pesos en lugar de Centavos y Mes como texto."""
+    df = format_months(df_gastos)
+    if "Centavos" in df.columns:
+        position = df.columns.get_loc("Centavos")
+        montos = df["Centavos"] / 100
+        df = df.drop(columns="Centavos")
+        df.insert(position, "Monto", montos)
+    return df
+
+
+def summarize(df_gastos, excluir=CATEGORIAS_A_EXCLUIR):
+    """
+    Resúmenes de gasto: sólo montos positivos y sin las categorías excluidas.
+    Regresa (df_resumen_final, resumen_cat, pivot).
+    """
+    df_solo_gastos = df_gastos[df_gastos["Centavos"] > 0]
+    df_resumen_final = df_solo_gastos[~df_solo_gastos["Categoría"].isin(excluir)]
+    # Sumas en centavos enteros; se pasan a pesos al final.
+    totales = df_resumen_final.groupby("Categoría", observed=True)["Centavos"].sum()
+    resumen_cat = pd.DataFrame({"Categoría": totales.index.astype(str), "Monto": totales.to_numpy() / 100})
+    resumen_cat = resumen_cat.sort_values("Monto", ascending=False)
+    pivot = pd.pivot_table(
+        df_resumen_final,
+        values="Centavos",
+        index="Mes",
+        columns="Categoría",
+        aggfunc="sum",
+        fill_value=0,
+        observed=True
+    ) / 100
+    pivot.index = pd.PeriodIndex(pivot.index.astype(object), freq="M", name="Mes")
+    pivot.columns = pd.Index(pivot.columns.astype(str), name="Categoría")
+    return df_resumen_final, resumen_cat, pivot
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Cargos recurrentes (suscripciones, servicios, seguros) detectados en el
+historial por su periodicidad, no por palabras clave.
+
+Los cargos se agrupan por comercio (`merchant_key`: "NETFLIX.COM REF 8812"
+y "NETFLIX.COM" son el mismo) y, dentro de cada comercio, por monto:
+ordenados por monto, empieza una serie nueva cuando un cargo sube más de
+AMOUNT_TOLERANCE respecto al anterior. Cada serie se ordena por fecha; su
+monto debe variar menos de AMOUNT_TOLERANCE de un cargo al siguiente (un
+seguro que sube 3% al año sigue siendo la misma serie) y sus intervalos en
+días se comparan con las ventanas de CADENCES. Todo se hace con arreglos
+ordenados de numpy y bincount, sin ciclos por comercio.
+"""
+import numpy as np
+import pandas as pd
+
+from gastos.categorias import ENGINE
+from gastos.pipeline import CATEGORIAS_A_EXCLUIR, to_cents
+
+# Cadencia: (meses entre cargos, intervalo mínimo y máximo en días, cargos mínimos).
+# Con menos cargos, compras sueltas de montos parecidos coinciden por azar.
+CADENCES = {
+    "Mensual": (1, 26, 35, 4),
+    "Anual": (12, 350, 380, 3),
+}
+
+# Variación máxima del monto dentro de una serie (precio que sube, tipo de cambio).
+AMOUNT_TOLERANCE = 0.10
+
+# Fracción de intervalos que deben caer en la ventana: un mes sin cargo no rompe la serie.
+MIN_REGULAR_SHARE = 0.75
+
+PROJECTION_COLUMNS = ["Descripción", "Categoría", "Cadencia", "Monto", "Cargos", "Último cargo", "Próximo cargo"]
+
+
+def _empty_projection() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Descripción": pd.Series(dtype=object), "Categoría": pd.Series(dtype=object),
+        "Cadencia": pd.Series(dtype=object), "Monto": pd.Series(dtype="float64"),
+        "Cargos": pd.Series(dtype="int64"), "Último cargo": pd.Series(dtype="datetime64[ns]"),
+        "Próximo cargo": pd.Series(dtype="datetime64[ns]"),
+    }, columns=PROJECTION_COLUMNS)
+
+
+def merchant_key(descripcion: str, engine=ENGINE) -> str:
+    """Clave de comercio de las reglas sin ninguna palabra con tres o más dígitos (referencias)."""
+    key = engine.keys.key(descripcion)
+    tokens = [token for token in key.split() if sum(ch.isdigit() for ch in token) < 3]
+    return " ".join(tokens) or key
+
+
+def _series_ids(merchant: np.ndarray, cents: np.ndarray) -> np.ndarray:
+    """Serie de cada cargo: mismo comercio y montos a menos de AMOUNT_TOLERANCE del anterior."""
+    order = np.lexsort((cents, merchant))
+    m, c = merchant[order], cents[order]
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = (m[1:] != m[:-1]) | (c[1:] > c[:-1] * (1 + AMOUNT_TOLERANCE))
+    ids = np.empty(len(order), dtype=np.int64)
+    ids[order] = np.cumsum(starts) - 1
+    return ids
+
+
+def detect_recurring(df_gastos, excluir=CATEGORIAS_A_EXCLUIR, engine=ENGINE):
+    """
+    Regresa (recurrente, proximos).
+
+    `recurrente` es una Serie booleana alineada con `df_gastos` que marca los
+    cargos (monto > 0, sin categorías excluidas) de una serie mensual o anual
+    con monto estable. `proximos` tiene una fila por serie que sigue vigente al
+    final del historial (su siguiente cargo aún no se ha atrasado), con la
+    descripción, categoría y monto del último cargo, la cadencia, el número
+    de cargos, el último cargo y el próximo proyectado.
+    """
+    recurrente = pd.Series(False, index=df_gastos.index, name="Recurrente")
+    centavos = df_gastos["Centavos"] if "Centavos" in df_gastos.columns else to_cents(df_gastos["Monto"])
+    cargos = ((centavos > 0) & ~df_gastos["Categoría"].isin(excluir) & df_gastos["Fecha"].notna()).to_numpy()
+    if not cargos.any():
+        return recurrente, _empty_projection()
+
+    rows = np.flatnonzero(cargos)
+    desc_codes, descripciones = pd.factorize(df_gastos["Descripción"].to_numpy()[rows])
+    merchant_codes, _ = pd.factorize(pd.Index([merchant_key(d, engine) for d in descripciones]))
+    merchant = merchant_codes[desc_codes]
+    cents = centavos.to_numpy()[rows].astype(np.int64)
+    days = df_gastos["Fecha"].to_numpy()[rows].astype("datetime64[D]").astype(np.int64)
+
+    ids = _series_ids(merchant, cents)
+    n_series = int(ids.max()) + 1
+
+    # Intervalos entre cargos consecutivos de cada serie; dos cargos el mismo día
+    # (estados traslapados, cargo duplicado) cuentan como uno.
+    order = np.lexsort((days, ids))
+    s_ids, s_days, s_cents = ids[order], days[order], cents[order]
+    same = s_ids[1:] == s_ids[:-1]
+    gaps = np.diff(s_days)
+    # Monto estable: cada cargo a menos de AMOUNT_TOLERANCE del anterior.
+    jump = np.maximum(s_cents[1:], s_cents[:-1]) > np.minimum(s_cents[1:], s_cents[:-1]) * (1 + AMOUNT_TOLERANCE)
+    stable = np.bincount(s_ids[1:][same & jump], minlength=n_series) == 0
+    valid = same & (gaps > 0)
+    gaps, gap_ids = gaps[valid], s_ids[1:][valid]
+    charges = np.bincount(gap_ids, minlength=n_series) + 1
+
+    # Último cargo de cada serie: la última posición de cada una en `order`.
+    ends = np.flatnonzero(np.append(s_ids[1:] != s_ids[:-1], True))
+    last = s_days[ends]
+    last_cents = s_cents[ends]
+    last_row = rows[order][ends]
+
+    cadence = np.full(n_series, -1)
+    for i, (_, low, high, min_charges) in reversed(list(enumerate(CADENCES.values()))):
+        in_window = np.bincount(gap_ids, weights=(gaps >= low) & (gaps <= high), minlength=n_series)
+        share = in_window / np.maximum(charges - 1, 1)
+        regular = stable & (charges >= min_charges) & (share >= MIN_REGULAR_SHARE)
+        cadence[regular] = i  # en orden inverso: si varias aplican, gana la primera de CADENCES
+
+    found = cadence >= 0
+    recurrente.iloc[rows[found[ids]]] = True
+
+    names = list(CADENCES)
+    windows = np.array([high for _, _, high, _ in CADENCES.values()])
+    history_end = df_gastos["Fecha"].max().to_datetime64().astype("datetime64[D]").astype(np.int64)
+    vigentes = np.flatnonzero(found & (last + windows[np.maximum(cadence, 0)] >= history_end))
+    if not len(vigentes):
+        return recurrente, _empty_projection()
+
+    ultimo = pd.Series(last[vigentes].astype("datetime64[D]").astype("datetime64[ns]"))
+    proximo = ultimo.copy()
+    for i, (months, _, _, _) in enumerate(CADENCES.values()):
+        mask = cadence[vigentes] == i
+        proximo = proximo.where(~mask, ultimo + pd.DateOffset(months=months))
+    fuente = df_gastos.iloc[last_row[vigentes]]
+    proximos = pd.DataFrame({
+        "Descripción": fuente["Descripción"].to_numpy(dtype=object),
+        "Categoría": fuente["Categoría"].astype(str).to_numpy(dtype=object),
+        "Cadencia": [names[i] for i in cadence[vigentes]],
+        "Monto": last_cents[vigentes] / 100,
+        "Cargos": charges[vigentes].astype(np.int64),
+        "Último cargo": ultimo,
+        "Próximo cargo": proximo,
+    }, columns=PROJECTION_COLUMNS)
+    return recurrente, proximos.sort_values(["Próximo cargo", "Descripción"], ignore_index=True)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Límites para el modo multiusuario (varias sesiones de Streamlit en un mismo
+proceso).
+
+ParseLimiter reparte entre todas las sesiones un número fijo de turnos para
+leer PDFs: una sesión pide tantos turnos como procesos quiere usar y espera si
+no hay suficientes, así que una ráfaga de cargas no satura el CPU.
+SessionMemory guarda los datos de una sesión con un presupuesto de bytes y
+desaloja primero lo que se usó hace más tiempo.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+class ParseLimiter:
+    """Semáforo con pesos: `slot(n)` toma hasta `n` de `slots` turnos y los regresa al salir."""
+
+    def __init__(self, slots: int):
+        self.slots = max(1, int(slots))
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, n: int = 1, on_wait=None):
+        """
+        Toma min(n, slots) turnos; si no están libres llama `on_wait()` una vez y
+        espera. Regresa cuántos turnos se tomaron.
+
+        `on_wait` corre sin el candado y antes de contarse como en espera: puede
+        ser una llamada de Streamlit, que lanza su excepción de rerun/stop ahí.
+        """
+        n = max(1, min(int(n), self.slots))
+        with self._cond:
+            free = self.active + n <= self.slots
+            if free:
+                self.active += n
+        if not free:
+            if on_wait is not None:
+                on_wait()
+            with self._cond:
+                self.waiting += 1
+                try:
+                    self._cond.wait_for(lambda: self.active + n <= self.slots)
+                finally:
+                    self.waiting -= 1
+                self.active += n
+        try:
+            yield n
+        finally:
+            with self._cond:
+                self.active -= n
+                self._cond.notify_all()
+
+
+def sizeof(value) -> int:
+    """Bytes aproximados de un valor guardado en la sesión (DataFrames, Series, bytes y tuplas de ellos)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class SessionMemory:
+    """
+    Datos de una sesión con llave, acotados a `max_bytes`. Al pasarse del
+    presupuesto se desalojan las entradas usadas hace más tiempo (nunca la
+    recién guardada); quien lee debe estar listo para recalcular lo que falte.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def keys(self):
+        return list(self._entries)
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self.pop(key)
+        size = sizeof(value)
+        self._entries[key] = value
+        self._sizes[key] = size
+        self._total_bytes += size
+        while len(self._entries) > 1 and self._total_bytes > self.max_bytes:
+            old_key = next(iter(self._entries))
+            self.pop(old_key)
+            self.evicted += 1
+
+    def pop(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._total_bytes -= self._sizes.pop(key)
+        return self._entries.pop(key)
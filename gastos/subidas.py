@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+PDFs subidos copiados a disco.
+
+st.file_uploader entrega cada archivo completo en memoria. Si además se
+sacan sus bytes (getvalue()) para hashearlos, leerlos y mandarlos a otros
+procesos, un lote grande multiplica esa memoria. UploadSpool copia cada
+archivo una sola vez, por bloques, a un directorio temporal de la sesión;
+de ahí en adelante sólo se usa la ruta: los lectores abren el PDF desde
+disco y a los procesos se les manda la ruta, no los bytes.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import weakref
+from dataclasses import dataclass
+
+CHUNK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class SpooledUpload:
+    """Un archivo subido ya en disco: nombre original, ruta, tamaño y SHA-256 de los bytes."""
+    name: str
+    path: str
+    size: int
+    sha256: str
+
+
+class UploadSpool:
+    """
+    Directorio temporal con los archivos subidos en una sesión. Un archivo se
+    copia la primera vez que se ve (por su id del uploader) y se borra cuando
+    deja de estar en `retain()`; el directorio se borra con `close()` o
+    cuando el objeto se recolecta.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = tempfile.mkdtemp(prefix="gastos_subidas_", dir=directory)
+        self._files = {}
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def __len__(self):
+        return len(self._files)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(spooled.size for spooled in {s.path: s for s in self._files.values()}.values())
+
+    def add(self, upload) -> SpooledUpload:
+        """Copia `upload` (UploadedFile o cualquier archivo binario con `name`) si no estaba ya en disco."""
+        upload_id = getattr(upload, "file_id", None) or (upload.name, getattr(upload, "size", None))
+        spooled = self._files.get(upload_id)
+        if spooled is not None and os.path.exists(spooled.path):
+            return spooled
+        h = hashlib.sha256()
+        size = 0
+        fd, partial = tempfile.mkstemp(suffix=".part", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                upload.seek(0)
+                for chunk in iter(lambda: upload.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            upload.seek(0)
+            # Mismo contenido, misma ruta: un PDF subido dos veces ocupa un solo archivo.
+            path = os.path.join(self.directory, h.hexdigest() + ".pdf")
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        spooled = SpooledUpload(upload.name, path, size, h.hexdigest())
+        self._files[upload_id] = spooled
+        return spooled
+
+    def retain(self, spooled) -> None:
+        """Borra los archivos que no están en `spooled` (los que se quitaron del uploader)."""
+        keep = {s.path for s in spooled}
+        self._files = {upload_id: s for upload_id, s in self._files.items() if s.path in keep}
+        for entry in os.scandir(self.directory):
+            if entry.path not in keep:
+                os.remove(entry.path)
+
+    def close(self):
+        self._finalizer()
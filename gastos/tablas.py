@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción por columnas (modo tabla).
+
+En lugar de aplanar la página a texto y adivinar las columnas con la regex
+del monto final, se usan las palabras de la página con su posición x (del
+lector de gastos.lectores: cajas de caracteres de PDFium o extract_words de
+pdfplumber). Las columnas (fin de la fecha, inicio del monto) se detectan
+una vez por formato de estado de cuenta y se guardan por emisor (`_BANDS`,
+con el emisor de gastos.emisores); después cada renglón se corta por
+posición y las regex sólo se aplican a los campos cortos. Los renglones sin
+fecha en la columna de fecha (encabezados, texto legal) se descartan sin
+buscar nada en ellos.
+
+Las líneas RFC/REF de AMEX se unen a la descripción de la transacción
+anterior. Si en un archivo no sale ninguna transacción por columnas, se usa
+el parser de texto sobre los mismos renglones.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+
+from gastos.extraccion import (
+    AMOUNT_PAT, CREDIT_WORDS, DATE_PAT, YEAR_HINT_PAGES, YEAR_PAT, ExtractionInfo, _to_record, date_parts,
+    iter_transactions, parse_amount, transactions_frame,
+)
+from gastos import emisores
+from gastos.emisores import detect_issuer
+from gastos.lectores import open_reader, pdf_source, resolve_backend
+
+# Distancia vertical (puntos) para considerar dos palabras en el mismo renglón.
+ROW_TOLERANCE = 3
+# Holgura horizontal al asignar palabras a una columna.
+BAND_TOLERANCE = 2
+# Renglones con fecha y monto necesarios para aceptar unas columnas.
+MIN_ROWS = 3
+
+
+@dataclass(frozen=True)
+class ColumnBands:
+    """Columnas de un formato: la fecha termina en `date_end` y el monto empieza en `amount_start`."""
+    date_end: float
+    amount_start: float
+
+    def split(self, row):
+        """(fecha, descripción, monto) de un renglón de palabras ordenadas por x."""
+        date, desc, amount = [], [], []
+        for word in row:
+            if word["x1"] <= self.date_end + BAND_TOLERANCE:
+                date.append(word["text"])
+            elif word["x0"] >= self.amount_start - BAND_TOLERANCE:
+                amount.append(word["text"])
+            else:
+                desc.append(word["text"])
+        return " ".join(date), " ".join(desc), " ".join(amount)
+
+
+# Columnas detectadas por emisor; se reutilizan en los siguientes archivos.
+_BANDS = {}
+
+
+def group_rows(words):
+    """Palabras agrupadas en renglones (por posición vertical), cada uno ordenado por x."""
+    rows = []
+    current, top = [], None
+    for word in sorted(words, key=lambda w: (round(w["top"]), w["x0"])):
+        if top is not None and abs(word["top"] - top) > ROW_TOLERANCE:
+            rows.append(sorted(current, key=lambda w: w["x0"]))
+            current = []
+        if not current:
+            top = word["top"]
+        current.append(word)
+    if current:
+        rows.append(sorted(current, key=lambda w: w["x0"]))
+    return rows
+
+
+def detect_bands(rows):
+    """Columnas a partir de los renglones que empiezan con fecha y terminan con monto, o None."""
+    date_ends, amount_starts, desc_starts, desc_ends = [], [], [], []
+    for row in rows:
+        offsets, pos = [], 0
+        for word in row:
+            offsets.append(pos)
+            pos += len(word["text"]) + 1
+        text = " ".join(word["text"] for word in row)
+        date_match = DATE_PAT.match(text)
+        amount_match = AMOUNT_PAT.search(text)
+        if not date_match or not amount_match or date_match.end() > amount_match.start(1):
+            continue
+        date_words = [w for w, off in zip(row, offsets) if off < date_match.end()]
+        amount_words = [w for w, off in zip(row, offsets) if off >= amount_match.start(1)]
+        if not amount_words or len(date_words) + len(amount_words) >= len(row):
+            continue
+        desc_words = row[len(date_words):len(row) - len(amount_words)]
+        date_ends.append(date_words[-1]["x1"])
+        amount_starts.append(amount_words[0]["x0"])
+        desc_starts.append(desc_words[0]["x0"])
+        desc_ends.append(desc_words[-1]["x1"])
+    if len(date_ends) < MIN_ROWS:
+        return None
+    # Sólo es tabla si hay un hueco vertical entre columnas en todos los renglones
+    # (en texto corrido el monto de un renglón cae sobre la descripción de otro).
+    if max(date_ends) >= min(desc_starts) or max(desc_ends) >= min(amount_starts):
+        return None
+    return ColumnBands(max(date_ends), min(amount_starts))
+
+
+def slice_rows(rows, bands, issuer: str = None):
+    """
+    Coincidencias (día, mes, año o None, descripción, monto) de los renglones
+    de una página. Con emisor conocido el monto se lee como en su parser de
+    texto ("145,10" es 145.10), así que ambos modos dan los mismos totales.
+    """
+    amount_of = parse_amount if issuer is None else emisores.parse_amount
+    matches = []
+    for row in rows:
+        date_text, desc, amount_text = bands.split(row)
+        date_match = DATE_PAT.match(date_text) if date_text[:1].isdigit() else None
+        if date_match is None:
+            # Continuación de la descripción anterior (RFC/REF de AMEX).
+            text = " ".join(part for part in (date_text, desc) if part)
+            if matches and not amount_text and text.lower().startswith(("rfc", "ref")):
+                day, month, year, previous, amount = matches[-1]
+                matches[-1] = (day, month, year, previous + " | " + text, amount)
+            continue
+        amount_match = AMOUNT_PAT.search(amount_text) if amount_text else None
+        if not date_match or not amount_match or amount_match.start() != 0:
+            continue
+        parts = date_parts(date_match)
+        amount = amount_of(amount_match.group(1))
+        if parts is None or amount is None:
+            continue
+        desc = desc.strip(" -–—|")
+        if amount_match.group(2) or any(w in desc.lower() for w in CREDIT_WORDS):
+            amount = -abs(amount)
+        matches.append((*parts, desc, amount))
+    return matches
+
+
+def extract_transactions_tables(file, issuer: str = None, info: ExtractionInfo = None, backend: str = None):
+    """
+    Extrae transacciones de un PDF por columnas. `issuer` evita adivinar el
+    emisor y `backend` elige el lector de palabras. El modo usado
+    ("tablas/<lector>", o "texto/<lector>" si no hubo columnas) queda en
+    `df.attrs["backend"]` e `info`.
+    """
+    if info is None:
+        info = ExtractionInfo()
+    name = resolve_backend(backend)
+    matches, page_texts, head_years, all_years = [], [], Counter(), Counter()
+    bands = None
+    with open_reader(name, pdf_source(file)) as reader:
+        for n in range(len(reader)):
+            rows = group_rows(reader.page_words(n))
+            page_text = "\n".join(" ".join(w["text"] for w in row) for row in rows)
+            page_texts.append(page_text)
+            years = YEAR_PAT.findall(page_text)
+            all_years.update(years)
+            if n < YEAR_HINT_PAGES:
+                head_years.update(years)
+            if n == 0:
+                if issuer is None:
+                    parser = detect_issuer(page_text)
+                    issuer = parser.name if parser is not None else None
+                info.issuer = issuer
+                bands = _BANDS.get(issuer)
+            page_matches = slice_rows(rows, bands, issuer) if bands is not None else []
+            if not page_matches:
+                # Formato nuevo o distinto al guardado: se detectan las columnas en esta página.
+                detected = detect_bands(rows)
+                if detected is not None and detected != bands:
+                    bands = detected
+                    if issuer is not None:
+                        _BANDS[issuer] = bands
+                    page_matches = slice_rows(rows, bands, issuer)
+            matches.extend(page_matches)
+            info.pages += 1
+
+    if not matches:
+        info.backend = f"texto/{name}"
+        df = transactions_frame(iter_transactions(page_texts))
+    else:
+        info.backend = f"tablas/{name}"
+        years = head_years or all_years
+        year_hint = int(years.most_common(1)[0][0]) if years else datetime.now().year
+        records = (_to_record(match, year_hint) for match in matches)
+        df = transactions_frame(record for record in records if record is not None)
+    df.attrs["backend"] = info.label()
+    df.attrs["emisor"] = info.issuer
+    return df
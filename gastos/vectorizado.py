@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Parser por lotes sobre columnas de texto.
+
+Hace lo mismo que `extraccion.match_line` línea por línea, pero cada paso
+(limpieza de espacios, importe, fecha, descripción) corre una sola vez sobre
+todas las líneas del documento, y las fechas salen de `pd.to_datetime` sobre
+arreglos de año/mes/día. Si pyarrow está instalado, las expresiones regulares
+corren en los kernels de Arrow (RE2, en C++); si no, se usa `pandas.Series.str`.
+
+Con texto ASCII la salida es la misma que la del parser por líneas. En el modo Arrow los espacios Unicode se normalizan a " " antes de
+aplicar los patrones, porque RE2 sólo reconoce espacios ASCII en `\\s`.
+"""
+import re
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from gastos.extraccion import (
+    COLUMNS, DATE_PAT, EURO_PAT, MESES_MAP, YEAR_HINT_PAGES, YEAR_PAT, iter_lines, merge_continuations,
+    transactions_frame,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    _ARROW_STRING = pd.StringDtype("pyarrow")
+except ImportError:
+    pa = pc = None
+
+# AMOUNT_PAT con el texto anterior capturado: `^(.*?)` perezoso reproduce el
+# primer inicio que encontraría AMOUNT_PAT.search().
+LINE_PAT = re.compile(r"^(?P<pre>.*?)(?P<amt>[+-]?\s*\$?\s*\(?\s*\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?\s*\)?)\s*(?P<cr>CR)?\s*$", re.IGNORECASE)
+CREDIT_PAT = re.compile(r"abono|pago|payment")
+# DATE_PAT con el texto anterior capturado, para saber dónde termina la fecha:
+# como en match_line, si se traslapa con el importe la línea no es transacción.
+DATED_PAT = re.compile(r"^(?P<dlead>.*?)(?P<fecha>" + DATE_PAT.pattern + ")", re.IGNORECASE)
+
+# Versiones RE2 (Arrow) de LINE_PAT y DATE_PAT.
+_LINE_RE2 = "(?i)" + LINE_PAT.pattern
+_DATE_RE2 = "(?i)" + DATE_PAT.pattern
+_UNICODE_SPACE_RE2 = r"[\pZ\x0b\x1c-\x1f\x85]"
+# Grupos opcionales: Arrow los reporta como "" cuando no participan.
+_OPTIONAL_GROUPS = ("cr", "y")
+
+
+def year_hint_for(page_texts, year_pages: int = YEAR_HINT_PAGES) -> int:
+    """Mismo criterio que iter_transactions: primeras páginas y, si no, todo el documento."""
+    years = Counter(YEAR_PAT.findall("\n".join(page_texts[:year_pages])))
+    if not years:
+        years = Counter(YEAR_PAT.findall("\n".join(page_texts)))
+    return int(years.most_common(1)[0][0]) if years else datetime.now().year
+
+
+def parse_amounts(raw: pd.Series) -> pd.Series:
+    """parse_amount vectorizado: NaN donde el importe no es válido."""
+    s = raw.str.strip()
+    neg = s.str.startswith("(", na=False) & s.str.endswith(")", na=False)
+    s = s.where(~neg, s.str[1:-1])
+    s = s.str.replace("$", "", regex=False).str.replace(" ", "", regex=False)
+    euro = s.str.contains(EURO_PAT, na=False)
+    s = s.where(~euro, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    s = s.where(euro, s.str.replace(",", "", regex=False))
+    values = pd.to_numeric(s, errors="coerce").astype("float64")
+    return values.where(~neg, -values)
+
+
+class _PandasColumns:
+    """Limpieza y extracción con `Series.str` (re de Python)."""
+
+    def __init__(self, lines):
+        text = pd.Series(lines, dtype=object)
+        self.clean = text.str.replace(r"\s{2,}", " ", regex=True).str.strip()
+
+    def extract(self, pattern, rows=None):
+        clean = self.clean if rows is None else self.clean[rows]
+        return clean.str.extract(pattern)
+
+    def credit(self):
+        return self.clean.str.lower().str.contains(CREDIT_PAT, na=False)
+
+
+class _ArrowColumns:
+    """Limpieza y extracción con kernels de Arrow (RE2)."""
+
+    def __init__(self, lines):
+        arr = pa.array(lines, type=pa.string())
+        arr = pc.replace_substring_regex(arr, _UNICODE_SPACE_RE2, " ")
+        self.arr = pc.utf8_trim_whitespace(pc.replace_substring_regex(arr, r"\s{2,}", " "))
+        self.index = pd.RangeIndex(len(arr))
+
+    def extract(self, pattern, rows=None):
+        arr, index = self.arr, self.index
+        if rows is not None:
+            arr = arr.filter(pa.array(rows.to_numpy()))
+            index = self.index[rows.to_numpy()]
+        struct = pc.extract_regex(arr, "(?i)" + pattern.pattern)
+        missing = struct.is_null()
+        columns = {}
+        for i in range(struct.type.num_fields):
+            name = struct.type.field(i).name
+            field = pc.if_else(missing, pa.scalar(None, pa.string()), struct.field(i))
+            if name in _OPTIONAL_GROUPS:
+                field = pc.if_else(pc.equal(field, ""), pa.scalar(None, pa.string()), field)
+            columns[name] = pd.Series(pd.array(field, dtype=_ARROW_STRING), index=index)
+        return pd.DataFrame(columns, index=index)
+
+    def credit(self):
+        found = pc.match_substring_regex(pc.utf8_lower(self.arr), CREDIT_PAT.pattern)
+        return pd.Series(found.to_numpy(zero_copy_only=False), index=self.index)
+
+
+def parse_lines_frame(lines, year_hint: int) -> pd.DataFrame:
+    """Interpreta líneas ya unidas (RFC/REF) y regresa el DataFrame de transacciones."""
+    lines = list(lines)
+    if not lines:
+        return transactions_frame([])
+    columns = _ArrowColumns(lines) if pc is not None else _PandasColumns(lines)
+
+    parts = columns.extract(LINE_PAT)
+    amounts = parse_amounts(parts["amt"])
+    credit = parts["cr"].notna() | columns.credit()
+    amounts = amounts.where(~credit, -amounts.abs())
+
+    # Las fechas sólo se buscan en líneas con importe válido.
+    has_amount = amounts.notna()
+    amounts = amounts[has_amount]
+    parts = parts[has_amount]
+    dates = columns.extract(DATED_PAT, has_amount)
+    month_str = dates["m"].str.lower()
+    is_digit = month_str.str.isdigit().fillna(False).astype(bool)
+    month = pd.to_numeric(month_str.where(is_digit, month_str.str[:3].map(MESES_MAP)), errors="coerce").astype("float64")
+    year_str = dates["y"]
+    year = pd.to_numeric(year_str, errors="coerce").astype("float64")
+    year = year.where((year_str.str.len() != 2).fillna(True).astype(bool), year + 2000).fillna(year_hint)
+    # Años de 3 dígitos: igual que el parser por líneas, no son fechas válidas.
+    year = year.where(year >= 1000)
+    fecha = pd.to_datetime(
+        pd.DataFrame({"year": year, "month": month, "day": pd.to_numeric(dates["d"], errors="coerce").astype("float64")}),
+        errors="coerce",
+    )
+
+    date_end = dates["dlead"].str.len() + dates["fecha"].str.len()
+    before_amount = (date_end <= parts["pre"].str.len()).fillna(False).astype(bool)
+    valid = fecha.notna() & (month > 0) & before_amount
+    desc = parts.loc[valid, "pre"].str.replace(DATE_PAT, "", n=1, regex=True).str.strip(" -–—|")
+    return pd.DataFrame({
+        "Fecha": fecha[valid].to_numpy(dtype="datetime64[ns]"),
+        "Descripción": desc.to_numpy(dtype=object),
+        "Monto": amounts[valid].to_numpy(dtype=np.float64),
+    }, columns=COLUMNS)
+
+
+def parse_pages_vectorized(page_texts) -> pd.DataFrame:
+    page_texts = list(page_texts)
+    return parse_lines_frame(merge_continuations(iter_lines(page_texts)), year_hint_for(page_texts))